@@ -0,0 +1,95 @@
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+from bench_compression import COMMON
+from chapter_store import ChapterStore
+from text_cleaner import TextCleaner, learn_boilerplate
+
+# 正文清理的吞吐量（章/秒）：
+#   python bench/bench_clean.py --chapters 2000
+# 生成带广告行的章节（一部分能被规则文件匹配，一部分只能靠按频率识别），分别测量
+# 原来逐章调用 replace 和未编译正则的写法、规则文件的单次替换、识别重复行，以及批量重新清理章节库
+
+RULE_ADS = [
+    "天才一秒记住本站地址：www.example.com",
+    "请记住本书首发域名：example.com。手机版阅读网址：m.example.com",
+    "本章未完，请点击下一页继续阅读",
+]
+SITE_ADS = [
+    "笔趣阁小说网更新最快，欢迎收藏本站！",
+    "喜欢本书的朋友请把本站分享给更多书友～",
+]
+
+
+def raw_chapter(rng, n, paragraphs):
+    # 与解析后端的输出格式相同：段落之间是 <br> 转成的空行，结尾带手机版网址
+    lines = [f"第{n}章"]
+    for _ in range(paragraphs):
+        length = rng.randint(20, 120)
+        lines.append("\xa0\xa0\xa0\xa0" + "".join(rng.choices(COMMON, k=length)) + rng.choice("。！？…"))
+        if rng.random() < 0.03:
+            lines.append(rng.choice(RULE_ADS))
+        if rng.random() < 0.03:
+            lines.append(rng.choice(SITE_ADS))
+    return "\n\n".join(lines) + "记住手机版网址：m.example.com"
+
+
+def legacy_clean(text):
+    text = text.replace('\xa0', ' ')
+    text = re.sub(r'记住手机版网址：.*', '', text)
+    return text.strip()
+
+
+def rate(func, items):
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def count_ads(texts):
+    return sum(text.count(ad) for text in texts for ad in RULE_ADS + SITE_ADS)
+
+
+def main_bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chapters", type=int, default=2000)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    texts = [raw_chapter(rng, n, args.paragraphs) for n in range(1, args.chapters + 1)]
+    cleaner = TextCleaner.from_file()
+    print(f"{len(texts)} 章，广告行 {count_ads(texts)} 条")
+    print(f"    原写法: {rate(legacy_clean, texts):9.0f} 章/s，剩余广告 {count_ads([legacy_clean(t) for t in texts])}")
+    cleaned = [cleaner.clean(text) for text in texts]
+    print(f"  规则文件: {rate(cleaner.clean, texts):9.0f} 章/s，剩余广告 {count_ads(cleaned)}")
+    start = time.perf_counter()
+    boilerplate = learn_boilerplate(cleaned[:300])
+    learn_ms = (time.perf_counter() - start) * 1000
+    print(f"  识别重复行: {learn_ms:.1f} ms（300 章），识别出 {len(boilerplate)} 行")
+    print(
+        f" 规则+重复行: {rate(lambda text: cleaner.clean(text, boilerplate), texts):9.0f} 章/s，"
+        f"剩余广告 {count_ads([cleaner.clean(t, boilerplate) for t in texts])}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        chapters = [core.Chapter(f"第{n}章", f"/book/1/{n}.html") for n in range(1, len(texts) + 1)]
+        with ChapterStore(os.path.join(tmp, "chapters.db")) as store:
+            store.sync_catalog(chapters)
+            store.put_many([(c.link, c.title, text) for c, text in zip(chapters, texts)])
+            start = time.perf_counter()
+            changed = store.rewrite_texts(cleaner.clean)
+            elapsed = time.perf_counter() - start
+            print(f"  批量重新清理章节库: {len(texts) / elapsed:9.0f} 章/s，改动 {changed} 章")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,115 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+from chapter_store import ChapterStore
+from text_codec import zstd_module
+
+# 章节库压缩的磁盘占用与每章耗时对比：
+#   python bench/bench_compression.py --chapters 2000
+#   python bench/bench_compression.py --db book_data/书名/chapters.db   使用真实书籍（复制后测量，不修改原文件）
+# 生成的正文按常用字频率随机组合并夹杂站点的固定广告语，重复程度低于模拟站点的章节页
+
+COMMON = "的一是了我不人在他有这个上们来到时大地为子中你说生国年着就那和要她出也得里后自以会家可下而过天去能对小多然于心学么之都好看起发当没成只如事把还用第样道想作种开美总从无情己面最女但现前些所同日手又行意动方期它头经长儿回位分爱老因很给名法间斯知世什两次使身者被高已亲其进此话常与活正感"
+BOILERPLATE = [
+    "本章未完，请点击下一页继续阅读。",
+    "天才一秒记住本站地址，最快更新最新章节！",
+    "请记住本书首发域名，手机版阅读网址。",
+]
+
+
+def fake_chapter(rng, n, paragraphs):
+    weights = [1 / (i + 1) for i in range(len(COMMON))]
+    lines = [f"第{n}章"]
+    for _ in range(paragraphs):
+        length = rng.randint(20, 120)
+        lines.append("    " + "".join(rng.choices(COMMON, weights, k=length)) + rng.choice("。！？…"))
+        if rng.random() < 0.05:
+            lines.append(rng.choice(BOILERPLATE))
+    lines.append(BOILERPLATE[0])
+    return "\n".join(lines)
+
+
+def build_store(path, args):
+    rng = random.Random(args.seed)
+    chapters = [core.Chapter(f"第{n}章", f"/book/1/{n}.html") for n in range(1, args.chapters + 1)]
+    with ChapterStore(path) as store:
+        store.sync_catalog(chapters)
+        for i in range(0, len(chapters), 500):
+            store.put_many([(c.link, c.title, fake_chapter(rng, n, args.paragraphs)) for n, c in enumerate(chapters[i:i + 500], i + 1)])
+        store.checkpoint()
+
+
+def measure(path, mode, texts):
+    with ChapterStore(path) as store:
+        start = time.perf_counter()
+        before, after = store.recompress(mode)
+        recompress_s = time.perf_counter() - start
+        codec = store.codec
+    # 单章压缩与解压耗时，使用与章节库相同的编码器（含训练出的字典）
+    encoded = []
+    start = time.perf_counter()
+    for text in texts:
+        encoded.append(codec.encode(text))
+    encode_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for value in encoded:
+        codec.decode(value)
+    decode_s = time.perf_counter() - start
+    with ChapterStore(path) as store:
+        start = time.perf_counter()
+        for _ in store.iter_output_texts():
+            pass
+        read_s = time.perf_counter() - start
+    return {
+        "size": after,
+        "recompress_s": recompress_s,
+        "encode_us": encode_s / len(texts) * 1e6,
+        "decode_us": decode_s / len(texts) * 1e6,
+        "read_s": read_s,
+        "dictionary": codec.has_dictionary,
+    }
+
+
+def main_bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", help="已有书籍的 chapters.db")
+    parser.add_argument("--chapters", type=int, default=2000)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "chapters.db")
+        if args.db:
+            with ChapterStore(args.db) as source:
+                source.checkpoint()
+            shutil.copyfile(args.db, path)
+        else:
+            build_store(path, args)
+        with ChapterStore(path) as store:
+            texts = list(store.iter_output_texts())
+        modes = [None, "zlib"] + (["zstd"] if zstd_module() else [])
+        if not zstd_module():
+            print("未安装 zstandard，跳过 zstd（pip install zstandard）")
+        results = [(mode or "none", measure(path, mode, texts)) for mode in modes]
+    raw = sum(len(text.encode("utf-8")) for text in texts)
+    base = results[0][1]
+    print(f"{len(texts)} 章，正文 {raw / 1048576:.1f} MB")
+    for name, r in results:
+        label = name + ("+字典" if r["dictionary"] else "")
+        print(
+            f"{label:>10}: 章节库 {r['size'] / 1048576:7.1f} MB ({r['size'] / base['size'] * 100:5.1f}%)  "
+            f"压缩 {r['encode_us']:7.1f} us/章  解压 {r['decode_us']:6.1f} us/章  "
+            f"顺序读取全书 {r['read_s']:.2f} s  重写 {r['recompress_s']:.1f} s"
+        )
+
+
+if __name__ == "__main__":
+    main_bench()
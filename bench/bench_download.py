@@ -0,0 +1,90 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+from fake_site import serve_forever
+from library_db import LibraryDB
+from library_index import LibraryIndex
+
+# 对比不同并发数和解析进程数下 BookDownloader（DownloadThread 的下载逻辑）的下载耗时，用法：
+#   python bench/bench_download.py --chapters 300 --latency 0.05 --concurrency 1 4 8
+#   python bench/bench_download.py --chapters 3000 --latency 0 --paragraphs 200 --concurrency 8 --parse-workers 0 1 2 4
+# 模拟站点运行在独立进程中，不与被测的下载流水线争用 GIL
+
+
+def run_once(base_url, concurrency, rps, parse_workers):
+    with tempfile.TemporaryDirectory() as tmp:
+        core.BOOK_DATA_DIR = os.path.join(tmp, "book_data")
+        core.BOOKS_DIR = os.path.join(tmp, "books")
+        core.ensure_dirs()
+        core.library_index = LibraryIndex(os.path.join(core.BOOK_DATA_DIR, "library_index.db"))
+        core.library = LibraryDB(os.path.join(tmp, "library.db"))
+        core.baseUrl = base_url
+        core.rate_limiter.set_rate(rps)
+        core.PARSE_WORKERS = parse_workers
+        # 解析进程的启动时间不计入下载耗时
+        core.shutdown_parse_pool()
+        pool = core.get_parse_pool()
+        if pool is not None:
+            list(pool.map(core.parse_chapter_html, [""] * core.parse_worker_count()))
+        downloader = core.BookDownloader("bench", f"{base_url}/book/1/all.html", "", concurrency=concurrency)
+        before = core.client.stats()
+        start = time.perf_counter()
+        _, _, success, fail, _, _ = downloader.run()
+        elapsed = time.perf_counter() - start
+        core.library_index.close()
+        core.library.close()
+        result = {"success": success, "fail": fail}
+        after = core.client.stats()
+        result["requests"] = after["requests"] - before["requests"]
+        result["connections"] = after["connections"] - before["connections"]
+        return elapsed, result
+
+
+def main_bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chapters", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--parse-workers", type=int, nargs="+", default=[0], help="解析进程数，0 为在下载线程中解析")
+    parser.add_argument("--rps", type=float, default=0, help="每秒请求上限，0 为不限速")
+    args = parser.parse_args()
+    options = {"chapters": args.chapters, "paragraphs": args.paragraphs, "latency": args.latency}
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=serve_forever, args=(options, child_conn), daemon=True)
+    server.start()
+    try:
+        base_url = parent_conn.recv()
+        baseline = None
+        print(
+            f"章节数 {args.chapters}，每章 {args.paragraphs} 段，单次延迟 {args.latency}s，"
+            f"限速 {args.rps or '无'}，CPU {os.cpu_count()} 核"
+        )
+        for concurrency, parse_workers in itertools.product(args.concurrency, args.parse_workers):
+            elapsed, result = run_once(base_url, concurrency, args.rps, parse_workers)
+            baseline = baseline or elapsed
+            success, fail = result.get("success", 0), result.get("fail", 0)
+            print(
+                f"并发 {concurrency:>3} 解析进程 {parse_workers:>2}: {elapsed:7.2f}s  成功 {success} 失败 {fail}  "
+                f"{success / elapsed:7.1f} 章/秒  加速 {baseline / elapsed:5.2f}x  "
+                f"请求 {result['requests']} 新建连接 {result['connections']}"
+            )
+        parent_conn.send("stop")
+        parent_conn.recv()
+    finally:
+        core.shutdown_parse_pool()
+        server.join(timeout=5)
+        if server.is_alive():
+            server.terminate()
+
+
+if __name__ == "__main__":
+    main_bench()
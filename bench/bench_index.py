@@ -0,0 +1,71 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+from bench_compression import fake_chapter
+from chapter_store import ChapterStore
+from library_index import LibraryIndex
+
+# 本地全文索引的建立速度与查询耗时：
+#   python bench/bench_index.py --books 20 --chapters 1000
+# 生成若干本书的章节库，建立索引后分别查询常用字、常用词、少见词组和书名
+
+
+def build_library(folder, args):
+    rng = random.Random(args.seed)
+    novel_list = {}
+    for b in range(args.books):
+        title = f"测试书{b}"
+        chapters = [core.Chapter(f"第{n}章", f"/book/{b}/{n}.html") for n in range(1, args.chapters + 1)]
+        with ChapterStore.for_book(os.path.join(folder, title)) as store:
+            store.sync_catalog(chapters)
+            for i in range(0, len(chapters), 500):
+                store.put_many([
+                    (c.link, c.title, fake_chapter(rng, n, args.paragraphs))
+                    for n, c in enumerate(chapters[i:i + 500], i + 1)
+                ])
+            store.checkpoint()
+        novel_list[title] = {"url": "", "author": "作者"}
+    return novel_list
+
+
+def main_bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=20)
+    parser.add_argument("--chapters", type=int, default=1000)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        novel_list = build_library(tmp, args)
+        raw = sum(os.path.getsize(os.path.join(tmp, title, "chapters.db")) for title in novel_list)
+        index = LibraryIndex(os.path.join(tmp, "library_index.db"))
+        start = time.perf_counter()
+        count = index.sync_library(novel_list, tmp)
+        build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        index.sync_library(novel_list, tmp)
+        noop_ms = (time.perf_counter() - start) * 1000
+        size = os.path.getsize(index.path)
+        print(
+            f"{count} 章，章节库 {raw / 1048576:.0f} MB，索引 {size / 1048576:.0f} MB，"
+            f"建立 {build_s:.1f} s（{count / build_s:.0f} 章/s），无变化时同步 {noop_ms:.1f} ms"
+        )
+        for keyword in ("的", "我们", "天才一秒", "美丽的头发", "测试书7", "不存在的词"):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                results = index.search(keyword, tmp, limit=20)
+            elapsed = (time.perf_counter() - start) / args.repeat * 1000
+            print(f"{keyword:>8}: {len(results):3d} 条，{elapsed:7.1f} ms")
+        index.close()
+
+
+if __name__ == "__main__":
+    main_bench()
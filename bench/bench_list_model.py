@@ -0,0 +1,78 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtWidgets import QApplication, QListView, QListWidget
+
+from novel_model import NovelListModel
+
+# 已保存小说很多时刷新列表、筛选和按书名选中的耗时：
+#   python bench/bench_list_model.py --books 20000
+# 对比原来逐条 addItem 的 QListWidget（按行号查书名）与按需取行的 NovelListModel（按 id 定位）
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+
+def main_bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=20000)
+    args = parser.parse_args()
+    app = QApplication([])
+    novel_list = {f"测试书{i:06d}": {"url": f"/book/{i}/", "author": "作者"} for i in range(args.books)}
+    target = f"测试书{args.books - 1:06d}"
+
+    widget = QListWidget()
+    widget.show()
+
+    def fill_widget():
+        widget.clear()
+        for k, v in novel_list.items():
+            widget.addItem(f"{k}（{v.get('author', '')}）")
+        app.processEvents()
+
+    def select_widget():
+        widget.setCurrentRow(list(novel_list.keys()).index(target))
+        list(novel_list.keys())[widget.currentRow()]
+
+    def filter_widget():
+        for row in range(widget.count()):
+            item = widget.item(row)
+            item.setHidden("99" not in item.text())
+        app.processEvents()
+
+    model = NovelListModel()
+    view = QListView()
+    view.setUniformItemSizes(True)
+    view.setModel(model)
+    view.show()
+
+    def fill_model():
+        model.set_items([{"id": k, "label": f"{k}（{v.get('author', '')}）"} for k, v in novel_list.items()])
+        app.processEvents()
+
+    def select_model():
+        view.setCurrentIndex(model.index_of(target))
+        model.item_at(view.currentIndex())
+
+    def filter_model():
+        model.set_filter("99")
+        app.processEvents()
+        model.set_filter("")
+
+    print(f"{args.books} 本书")
+    print(f"  QListWidget: 刷新 {timed(fill_widget):8.1f} ms  选中最后一本 {timed(select_widget):7.1f} ms  "
+          f"筛选 {timed(filter_widget):7.1f} ms")
+    print(f"  列表模型:    刷新 {timed(fill_model):8.1f} ms  选中最后一本 {timed(select_model):7.1f} ms  "
+          f"筛选 {timed(filter_model):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main_bench()
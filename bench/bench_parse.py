@@ -0,0 +1,56 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+from check_parsers import reference_extract_chapter_text, reference_extract_chapters
+from fake_site import catalog_html, chapter_html
+from parsers import available_backends, get_backend
+
+# 解析吞吐量对比，用法：python bench/bench_parse.py --pages 300 --catalog-size 3000
+
+# 模拟真实页面的页头、导航和页脚，目标 div 之外的内容也要被解析
+PAGE_NOISE = (
+    '<div class="header">' + "".join(f'<a href="/sort/{i}/">分类{i}</a>' for i in range(40)) + "</div>"
+    "<script>var _hmt = _hmt || [];</script>"
+)
+
+
+def with_noise(html):
+    return html.replace("<body>", "<body>" + PAGE_NOISE, 1).replace("</body>", PAGE_NOISE + "</body>", 1)
+
+
+def measure(func, pages):
+    start = time.perf_counter()
+    for page in pages:
+        func(page)
+    return time.perf_counter() - start
+
+
+def main_bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--catalog-size", type=int, default=3000)
+    args = parser.parse_args()
+    chapters = [with_noise(chapter_html(1, n, paragraphs=60)) for n in range(args.pages)]
+    catalogs = [with_noise(catalog_html(1, args.catalog_size))] * 5
+
+    results = [("原始实现", measure(reference_extract_chapter_text, chapters), measure(reference_extract_chapters, catalogs))]
+    for name in available_backends():
+        core.html_parser = get_backend(name)
+        results.append((name, measure(core.extract_chapter_text, chapters), measure(core.extract_chapters, catalogs)))
+
+    base_chapter, base_catalog = results[0][1], results[0][2]
+    print(f"章节页 {args.pages} 个，目录页 {len(catalogs)} 个（每个 {args.catalog_size} 章）")
+    for name, chapter_time, catalog_time in results:
+        print(
+            f"{name:>12}: 章节 {args.pages / chapter_time:8.1f} 页/秒 ({base_chapter / chapter_time:5.2f}x)  "
+            f"目录 {len(catalogs) / catalog_time:7.2f} 页/秒 ({base_catalog / catalog_time:5.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main_bench()
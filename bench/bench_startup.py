@@ -0,0 +1,59 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 测量无界面路径的启动耗时，并确认不会导入 Qt 等重量级模块：
+#   python bench/bench_startup.py --runs 10
+
+HEAVY_MODULES = ["PyQt6", "requests", "bs4", "lxml"]
+
+CASES = [
+    ("import core", [sys.executable, "-c", "import core"]),
+    ("main.py --help", [sys.executable, os.path.join(ROOT, "main.py"), "--help"]),
+    ("main.py list", [sys.executable, os.path.join(ROOT, "main.py"), "list"]),
+    ("import gui（对比）", [sys.executable, "-c", "import gui"]),
+]
+
+
+def measure(cmd, runs, cwd, env):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def heavy_imports(env, cwd):
+    code = (
+        "import sys, core, main; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    return out.stdout.strip()
+
+
+def main_bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    with tempfile.TemporaryDirectory() as cwd:
+        baseline = measure([sys.executable, "-c", "pass"], args.runs, cwd, env)
+        print(f"{'python 空进程':<20} {baseline * 1000:8.1f} ms")
+        for name, cmd in CASES:
+            elapsed = measure(cmd, args.runs, cwd, env)
+            print(f"{name:<20} {elapsed * 1000:8.1f} ms  (+{(elapsed - baseline) * 1000:.1f} ms)")
+        loaded = heavy_imports(env, cwd)
+        print(f"无界面导入后加载的重量级模块: {loaded or '无'}")
+    return 1 if loaded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_bench())
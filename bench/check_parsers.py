@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import re
+import sys
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core
+from parsers import available_backends, get_backend
+
+# 校验各解析后端与原始 html.parser 实现的输出逐字节一致：
+#   python bench/check_parsers.py            校验所有已安装后端
+#   python bench/check_parsers.py --update   用原始实现重新生成 golden/expected.json
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+EXPECTED_FILE = os.path.join(GOLDEN_DIR, "expected.json")
+
+
+def reference_extract_chapters(html_content):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    chapters = []
+    for a_tag in soup.select('div.book_last dd a'):
+        href = a_tag.get('href')
+        title = a_tag.get_text(strip=True)
+        if title == "↓↓↓ 直达页面底部":
+            continue
+        if href and title != "":
+            chapters.append([href, title])
+    return chapters
+
+
+def reference_extract_chapter_text(html_content):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    content_div = soup.find('div', {'id': 'chaptercontent'})
+    if not content_div:
+        return ""
+    for script in content_div.find_all('script'):
+        script.decompose()
+    lines = []
+    for elem in content_div.contents:
+        if elem.name == 'br':
+            lines.append('\n')
+        elif hasattr(elem, 'get_text'):
+            lines.append(elem.get_text(strip=True))
+        elif isinstance(elem, str):
+            lines.append(elem.strip())
+    text = ''.join(lines)
+    text = text.replace('\xa0', ' ')
+    text = re.sub(r'记住手机版网址：.*', '', text)
+    return text.strip()
+
+
+def load_corpus():
+    corpus = {}
+    for name in sorted(os.listdir(GOLDEN_DIR)):
+        if name.endswith(".html"):
+            with open(os.path.join(GOLDEN_DIR, name), "r", encoding="utf-8", newline="") as f:
+                corpus[name] = f.read()
+    return corpus
+
+
+def extract(name, html):
+    if name.startswith("catalog_"):
+        return [[chapter.link, chapter.title] for chapter in core.extract_chapters(html)]
+    return core.extract_chapter_text(html)
+
+
+def reference(name, html):
+    if name.startswith("catalog_"):
+        return reference_extract_chapters(html)
+    return reference_extract_chapter_text(html)
+
+
+def main_check():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--update", action="store_true")
+    args = parser.parse_args()
+    corpus = load_corpus()
+    if args.update:
+        expected = {name: reference(name, html) for name, html in corpus.items()}
+        with open(EXPECTED_FILE, "w", encoding="utf-8") as f:
+            json.dump(expected, f, ensure_ascii=False, indent=4)
+        print(f"已写入 {len(expected)} 个样本的期望输出")
+        return 0
+    with open(EXPECTED_FILE, "r", encoding="utf-8") as f:
+        expected = json.load(f)
+    failed = 0
+    for backend in available_backends():
+        core.html_parser = get_backend(backend)
+        for name, html in corpus.items():
+            if extract(name, html) != expected[name]:
+                failed += 1
+                print(f"[{backend}] {name} 输出不一致")
+        print(f"[{backend}] 校验完成")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_check())
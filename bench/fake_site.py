@@ -0,0 +1,184 @@
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# 本地模拟站点：
+#   POST /search/              搜索结果页
+#   GET  /book/<id>/all.html   目录页
+#   GET  /book/<id>/<n>.html   章节页
+# 可注入固定延迟与抖动、随机错误以及超过限速时的 429 限流
+
+
+def book_name(book_id):
+    return f"测试小说{book_id}"
+
+
+def catalog_html(book_id, chapters):
+    links = ['<dd><a href="#footer">↓↓↓ 直达页面底部</a></dd>']
+    for n in range(1, chapters + 1):
+        links.append(f'<dd><a href="/book/{book_id}/{n}.html">第{n}章 测试章节</a></dd>')
+    return (
+        "<html><head><title>目录</title></head><body>"
+        '<div class="book_last"><dl>' + "".join(links) + "</dl></div>"
+        '<div id="footer"></div></body></html>'
+    )
+
+
+def chapter_html(book_id, n, paragraphs=30):
+    body = "<br/><br/>".join(
+        f"&nbsp;&nbsp;&nbsp;&nbsp;第{n}章第{i}段，这里是用于测试的正文内容。" for i in range(paragraphs)
+    )
+    return (
+        f"<html><head><title>第{n}章</title></head><body>"
+        f'<div id="chaptercontent">{body}<br/><script>ad();</script>'
+        "记住手机版网址：m.example.com</div></body></html>"
+    )
+
+
+def search_html(book_ids):
+    tables = []
+    for book_id in book_ids:
+        tables.append(
+            '<table class="list-item"><tr><td>'
+            f'<div class="article"><a href="/book/{book_id}/">{book_name(book_id)}</a></div>'
+            f'<p class="fs12 gray">作者:作者{book_id} 阅读:{book_id * 100}</p>'
+            f'<a href="/book/{book_id}/">这是{book_name(book_id)}的简介。</a>'
+            "</td></tr></table>"
+        )
+    return "<html><body>" + "".join(tables) + "</body></html>"
+
+
+class FakeSite:
+    def __init__(self, chapters=200, latency=0.05, books=1, paragraphs=30, jitter=0.0,
+                 error_rate=0.0, throttle_rps=0, seed=0, host="127.0.0.1", port=0):
+        self.chapters = chapters
+        self.latency = latency
+        self.books = books
+        self.paragraphs = paragraphs
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rps = throttle_rps
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # 关闭 Nagle，避免长连接下头部与正文分包触发延迟确认
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if not site._before_request(self):
+                    return
+                parts = self.path.strip("/").split("/")
+                if len(parts) == 3 and parts[0] == "book" and parts[1].isdigit():
+                    book_id, page = int(parts[1]), parts[2]
+                    if 1 <= book_id <= site.books:
+                        if page == "all.html":
+                            etag = f'"{book_id}-{site.chapters}"'
+                            if self.headers.get("If-None-Match") == etag:
+                                return self._send(304, "", {"ETag": etag})
+                            return self._send(200, catalog_html(book_id, site.chapters), {"ETag": etag})
+                        num = page[:-5] if page.endswith(".html") else ""
+                        if num.isdigit() and 1 <= int(num) <= site.chapters:
+                            return self._send(200, chapter_html(book_id, int(num), site.paragraphs))
+                self._send(404, "not found")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                form = parse_qs(self.rfile.read(length).decode("utf-8"))
+                if not site._before_request(self):
+                    return
+                if self.path.rstrip("/") != "/search":
+                    return self._send(404, "not found")
+                keyword = form.get("searchkey", [""])[0]
+                ids = [i for i in range(1, site.books + 1) if keyword and keyword in book_name(i)]
+                self._send(200, search_html(ids))
+
+            def _send(self, status, text, headers=None):
+                data = text.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    def _before_request(self, handler):
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            if now - self._window_start >= 1:
+                self._window_start, self._window_count = now, 0
+            self._window_count += 1
+            throttled = self.throttle_rps and self._window_count > self.throttle_rps
+            failed = not throttled and self.error_rate and self._random.random() < self.error_rate
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+            if throttled:
+                self.throttled += 1
+            elif failed:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if throttled:
+            handler._send(429, "too many requests", {"Retry-After": "1"})
+            return False
+        if failed:
+            handler._send(503, "service unavailable")
+            return False
+        return True
+
+    def counters(self):
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors, "throttled": self.throttled}
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def book_url(self, book_id=1):
+        return f"{self.base_url}/book/{book_id}/all.html"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def serve_forever(options, conn):
+    # 供 multiprocessing 在独立进程中运行模拟站点，避免服务端占用被测进程的内存与 GIL
+    site = FakeSite(**options).start()
+    conn.send(site.base_url)
+    conn.recv()
+    conn.send(site.counters())
+    site.stop()
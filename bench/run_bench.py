@@ -0,0 +1,311 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chapter_store
+import core
+from fake_site import serve_forever
+from http_client import FetchError
+from library_db import LibraryDB
+from library_index import LibraryIndex
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# 离线基准测试：在独立进程中启动模拟站点，测量完整下载流程（BookDownloader）、各阶段耗时、峰值内存与搜索延迟。
+#   python bench/run_bench.py --chapters 1000 --latency 0.02 --output new.json
+#   python bench/run_bench.py --compare old.json new.json
+# 结果为 JSON，便于在不同版本之间比较。
+
+
+def percentile(sorted_samples, q):
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * q))]
+
+
+class PhaseTimer:
+    # 通过替换模块函数记录每次调用的耗时，不需要修改被测代码
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+        self._patches = []
+
+    def wrap(self, owner, attr, phase):
+        original = getattr(owner, attr)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                name = phase(*args) if callable(phase) else phase
+                with self._lock:
+                    self.samples.setdefault(name, []).append(elapsed)
+
+        setattr(owner, attr, timed)
+        self._patches.append((owner, attr, original))
+
+    def restore(self):
+        for owner, attr, original in reversed(self._patches):
+            setattr(owner, attr, original)
+        self._patches.clear()
+
+    def report(self):
+        phases = {}
+        for name, samples in self.samples.items():
+            samples = sorted(samples)
+            phases[name] = {
+                "calls": len(samples),
+                "total_s": round(sum(samples), 4),
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+            }
+        return phases
+
+
+def rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_download(base_url, args):
+    timer = PhaseTimer()
+    timer.wrap(core, "get_catalog_response", "catalog_fetch")
+    timer.wrap(core, "get_html", "chapter_fetch")
+    timer.wrap(core, "extract_chapters", "catalog_parse")
+    timer.wrap(core, "extract_chapter_text", "chapter_parse")
+    timer.wrap(chapter_store.ChapterStore, "append", "store_write")
+    timer.wrap(core, "merge_chapters", "merge")
+    result = {}
+    first_progress = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            core.BOOK_DATA_DIR = os.path.join(tmp, "book_data")
+            core.BOOKS_DIR = os.path.join(tmp, "books")
+            core.ensure_dirs()
+            core.library_index = LibraryIndex(os.path.join(core.BOOK_DATA_DIR, "library_index.db"))
+            core.library = LibraryDB(os.path.join(tmp, "library.db"))
+            downloader = core.BookDownloader(
+                "bench", f"{base_url}/book/1/all.html", "", concurrency=args.concurrency,
+                progress=lambda *a: first_progress or first_progress.append(time.perf_counter()),
+            )
+            before = core.client.stats()
+            start = time.perf_counter()
+            _, _, success, fail, undownloaded, _ = downloader.run()
+            elapsed = time.perf_counter() - start
+            core.library_index.close()
+            core.library.close()
+            after = core.client.stats()
+            result.update(success=success, fail=fail, undownloaded=undownloaded, metrics=downloader.metrics.to_dict())
+    finally:
+        timer.restore()
+    http = {key: after[key] - before[key] for key in after}
+    return {
+        "chapters": args.chapters,
+        "success": result.get("success", 0),
+        "fail": result.get("fail", 0),
+        "undownloaded": result.get("undownloaded", 0),
+        "elapsed_s": round(elapsed, 4),
+        "chapters_per_s": round(result.get("success", 0) / elapsed, 2) if elapsed else 0,
+        "first_chapter_s": round(first_progress[0] - start, 4) if first_progress else None,
+        "phases": timer.report(),
+        # 下载器内置的阶段指标（与上面通过替换函数测得的耗时互相印证）
+        "metrics": {
+            name: {key: value for key, value in histogram.items() if key != "buckets"}
+            for name, histogram in result.get("metrics", {}).get("phases", {}).items()
+        },
+        "counters": result.get("metrics", {}).get("counters", {}),
+        "http": http,
+    }
+
+
+def bench_search(args):
+    # 注入错误或限流时部分搜索得到非 200 响应（FetchError），计入 errors，耗时只统计成功的搜索
+    samples, found, errors = [], 0, 0
+    for _ in range(args.searches):
+        start = time.perf_counter()
+        try:
+            found = len(core.search_novel(args.keyword, use_cache=False))
+        except FetchError:
+            errors += 1
+            continue
+        samples.append(time.perf_counter() - start)
+    if not samples:
+        return {"queries": 0, "errors": errors} if errors else {}
+    samples.sort()
+    # 重复搜索同一关键词，测量缓存命中的耗时；失败的结果不会缓存，先取得一次成功的结果
+    for _ in range(args.searches):
+        try:
+            core.search_cache.put(args.keyword, core.fetch_search_results(args.keyword))
+            break
+        except FetchError:
+            errors += 1
+    cached = []
+    for _ in range(args.searches):
+        start = time.perf_counter()
+        try:
+            core.search_novel(args.keyword)
+        except FetchError:
+            errors += 1
+            continue
+        cached.append(time.perf_counter() - start)
+    return {
+        "queries": len(samples),
+        "errors": errors,
+        "results": found,
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 0.5) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "cached_mean_ms": round(sum(cached) / len(cached) * 1000, 3) if cached else None,
+        "cache": core.search_cache.stats(),
+    }
+
+
+def run(args):
+    options = {
+        "chapters": args.chapters,
+        "books": args.books,
+        "paragraphs": args.paragraphs,
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "throttle_rps": args.throttle_rps,
+        "seed": args.seed,
+    }
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=serve_forever, args=(options, child_conn), daemon=True)
+    server.start()
+    try:
+        base_url = parent_conn.recv()
+        core.baseUrl = base_url
+        core.rate_limiter.set_rate(args.rps)
+        core.PARSE_WORKERS = args.parse_workers
+        core.search_cache.path = None
+        start_rss = rss_mb()
+        download = bench_download(base_url, args)
+        peak_rss = rss_mb()
+        search = bench_search(args)
+        parent_conn.send("stop")
+        download["server"] = parent_conn.recv()
+    finally:
+        server.join(timeout=5)
+        if server.is_alive():
+            server.terminate()
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parser": core.get_html_parser().name,
+        },
+        "config": dict(
+            options, concurrency=args.concurrency, rps=args.rps, searches=args.searches,
+            parse_workers=core.parse_worker_count(),
+        ),
+        "download": download,
+        "memory": {"start_rss_mb": start_rss, "peak_rss_mb": peak_rss},
+        "search": search,
+    }
+
+
+# (指标路径, 越大越好)
+COMPARED_METRICS = [
+    (("download", "chapters_per_s"), True),
+    (("download", "elapsed_s"), False),
+    (("download", "first_chapter_s"), False),
+    (("memory", "peak_rss_mb"), False),
+    (("search", "p50_ms"), False),
+    (("search", "p95_ms"), False),
+]
+
+
+def lookup(report, path):
+    for key in path:
+        if not isinstance(report, dict) or key not in report:
+            return None
+        report = report[key]
+    return report
+
+
+def compare(old_file, new_file, tolerance):
+    with open(old_file, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_file, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    metrics = list(COMPARED_METRICS)
+    for phase in sorted(set(lookup(old, ("download", "phases")) or {}) | set(lookup(new, ("download", "phases")) or {})):
+        metrics.append((("download", "phases", phase, "mean_ms"), False))
+    regressions = 0
+    for path, higher_is_better in metrics:
+        before, after = lookup(old, path), lookup(new, path)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        worse = -change if higher_is_better else change
+        flag = "退化" if worse > tolerance else ""
+        regressions += bool(flag)
+        print(f"{'.'.join(path):<40} {before:>12} -> {after:<12} {change:+7.1%} {flag}")
+    return 1 if regressions else 0
+
+
+def main_bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chapters", type=int, default=500)
+    parser.add_argument("--books", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rps", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=core.DOWNLOAD_CONCURRENCY)
+    parser.add_argument("--rps", type=float, default=0, help="客户端每秒请求上限，0 为不限速")
+    parser.add_argument("--parse-workers", type=int, help="解析进程数，默认按 CPU 核数，0 为在下载线程中解析")
+    parser.add_argument("--searches", type=int, default=20)
+    parser.add_argument("--keyword", default="测试小说1")
+    parser.add_argument("--output", help="结果写入的 JSON 文件，默认输出到标准输出")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--tolerance", type=float, default=0.1, help="判定为退化的变化比例")
+    args = parser.parse_args()
+    if args.compare:
+        return compare(args.compare[0], args.compare[1], args.tolerance)
+    # 被测代码的提示信息输出到 stderr，保证 stdout 只有 JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_bench())
@@ -0,0 +1,377 @@
+import hashlib
+import os
+import random
+import sqlite3
+import time
+
+from text_codec import DICT_SAMPLE_CHAPTERS, TextCodec
+
+STORE_FILE_NAME = "chapters.db"
+# 下载中完成的章节攒够多少条或间隔多少秒提交（刷盘）一次
+JOURNAL_BATCH = 32
+JOURNAL_INTERVAL = 1.0
+
+
+def chapter_file_name(link):
+    return link.lstrip('/').replace('/', '_') + ".txt"
+
+
+def text_digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest() if text else None
+
+
+class ChapterStore:
+    # 每本书一个 SQLite 文件，以章节链接为键，seq 记录目录顺序（不在当前目录中的章节为 NULL）。
+    # WAL 即追加写的日志：每批章节一个事务追加到 -wal 文件，synchronous=FULL 下每次提交刷盘一次，
+    # 进程崩溃或断电时已提交的批次都不会丢失；章节按批提交，刷盘次数为批次数而不是章节数，
+    # checkpoint 时合并回数据库文件。compression 为 "zstd" 或 "zlib" 时新写入的正文压缩保存，
+    # 读取时按数据类型自动解压，同一本书中压缩与未压缩的章节可以并存
+    def __init__(self, path, batch_size=None, batch_interval=None, compression=None):
+        self.path = path
+        self.batch_size = batch_size or JOURNAL_BATCH
+        self.batch_interval = JOURNAL_INTERVAL if batch_interval is None else batch_interval
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chapters ("
+            " link TEXT PRIMARY KEY,"
+            " seq INTEGER,"
+            " title TEXT NOT NULL DEFAULT '',"
+            " text TEXT,"
+            " digest TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chapters)")}
+        if "digest" not in columns:
+            self._conn.execute("ALTER TABLE chapters ADD COLUMN digest TEXT")
+            rows = self._conn.execute("SELECT link, text FROM chapters WHERE text IS NOT NULL").fetchall()
+            self._conn.executemany(
+                "UPDATE chapters SET digest = ? WHERE link = ?",
+                [(text_digest(text), link) for link, text in rows],
+            )
+        # size 为正文的 UTF-8 字节数，按大小分卷时使用
+        if "size" not in columns:
+            self._conn.execute("ALTER TABLE chapters ADD COLUMN size INTEGER")
+            self._conn.execute(
+                "UPDATE chapters SET size = length(CAST(text AS BLOB)) WHERE typeof(text) = 'text'"
+            )
+        # fetched_at 为最近一次从站点取得正文的时间（旧版数据为空），修复时据此显示
+        if "fetched_at" not in columns:
+            self._conn.execute("ALTER TABLE chapters ADD COLUMN fetched_at REAL")
+        # 覆盖索引：续传判断、输出清单和分卷只读索引，不必读取正文所在的溢出页
+        self._conn.execute("DROP INDEX IF EXISTS chapters_seq")
+        self._conn.execute("DROP INDEX IF EXISTS chapters_manifest")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chapters_outline ON chapters(seq, link, digest, size)")
+        # exported 记录输出文件中已写入的章节顺序及内容摘要，用于增量追加
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS exported (pos INTEGER PRIMARY KEY, link TEXT NOT NULL, digest TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS dictionaries (dict_id INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+        self._conn.commit()
+        self.codec = TextCodec(compression, dict(self._conn.execute("SELECT dict_id, data FROM dictionaries")))
+        self._dict_checked = False
+        if "size" not in columns:
+            # 已压缩的章节需要解压后才能得到大小
+            rows = self._conn.execute("SELECT link, text FROM chapters WHERE typeof(text) = 'blob'").fetchall()
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE chapters SET size = ? WHERE link = ?",
+                    [(len(self.codec.decode(text).encode("utf-8")), link) for link, text in rows],
+                )
+
+    @classmethod
+    def for_book(cls, base_folder, **kwargs):
+        os.makedirs(base_folder, exist_ok=True)
+        return cls(os.path.join(base_folder, STORE_FILE_NAME), **kwargs)
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def sync_catalog(self, chapters):
+        with self._conn:
+            self._conn.execute("UPDATE chapters SET seq = NULL WHERE seq IS NOT NULL")
+            self._conn.executemany(
+                "INSERT INTO chapters (link, seq, title) VALUES (?, ?, ?) "
+                "ON CONFLICT(link) DO UPDATE SET seq = excluded.seq, title = excluded.title",
+                [(chapter.link, idx, chapter.title) for idx, chapter in enumerate(chapters)],
+            )
+
+    def catalog_chapters(self):
+        return self._conn.execute(
+            "SELECT link, title FROM chapters WHERE seq IS NOT NULL ORDER BY seq"
+        ).fetchall()
+
+    def put(self, link, title, text):
+        self.put_many([(link, title, text)])
+
+    def append(self, link, title, text):
+        # 下载完成的章节先缓存，攒够一批或超过间隔后在一个事务中写入
+        self._pending.append((link, title, text))
+        if len(self._pending) >= self.batch_size or time.monotonic() - self._last_flush >= self.batch_interval:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self.put_many(self._pending)
+            self._pending = []
+        self._last_flush = time.monotonic()
+
+    def checkpoint(self):
+        # 把 WAL 中的日志合并回数据库文件并截断
+        self.flush()
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def put_many(self, items, fetched=True):
+        # fetched 为 False 表示正文不是刚从站点取得的（重新清理、迁移旧文件），保留原来的下载时间
+        fetched_at = time.time() if fetched else None
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO chapters (link, title, text, digest, size, fetched_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(link) DO UPDATE SET title = excluded.title, text = excluded.text, "
+                "digest = excluded.digest, size = excluded.size, "
+                "fetched_at = COALESCE(excluded.fetched_at, fetched_at)",
+                [
+                    (
+                        link, title, self.codec.encode(text), text_digest(text),
+                        len(text.encode("utf-8")) if text else 0, fetched_at,
+                    )
+                    for link, title, text in items
+                ],
+            )
+        if self.codec.mode == "zstd" and not self.codec.has_dictionary and not self._dict_checked:
+            self._train_dictionary()
+
+    def _train_dictionary(self):
+        # 本书攒够一定章数后训练 zstd 字典，之后写入的章节都使用该字典
+        rows = self._conn.execute(
+            "SELECT text FROM chapters WHERE digest IS NOT NULL LIMIT ?", (DICT_SAMPLE_CHAPTERS,)
+        ).fetchall()
+        if len(rows) < DICT_SAMPLE_CHAPTERS:
+            return
+        self._dict_checked = True
+        trained = self.codec.train(self.codec.decode(text) for (text,) in rows)
+        if trained is None:
+            return
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO dictionaries (dict_id, data) VALUES (?, ?)", trained)
+        self.codec.add_dictionary(*trained)
+
+    def get_meta(self, key, default=None):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, str(value)),
+            )
+
+    def get_text(self, link):
+        row = self._conn.execute("SELECT text FROM chapters WHERE link = ?", (link,)).fetchone()
+        return self.codec.decode(row[0]) if row else None
+
+    def iter_texts(self, links, chunk=500):
+        # 按链接批量读取 (link, title, text)
+        links = list(links)
+        for i in range(0, len(links), chunk):
+            part = links[i:i + chunk]
+            cursor = self._conn.execute(
+                f"SELECT link, title, text FROM chapters WHERE link IN ({','.join('?' * len(part))})", part
+            )
+            for link, title, text in cursor:
+                yield link, title, self.codec.decode(text)
+
+    def sample_texts(self, count):
+        # 随机抽取最多 count 章有内容的正文
+        links = [row[0] for row in self._conn.execute("SELECT link FROM chapters WHERE digest IS NOT NULL")]
+        sample = random.sample(links, min(count, len(links)))
+        return [text for _, _, text in self.iter_texts(sample)]
+
+    def rewrite_texts(self, transform, chunk=200):
+        # 对全部正文应用 transform，只写回有变化的章节；摘要随之更新，成品文件和索引按摘要增量重建
+        self.flush()
+        links = [row[0] for row in self._conn.execute("SELECT link FROM chapters WHERE digest IS NOT NULL")]
+        changed = 0
+        for i in range(0, len(links), chunk):
+            rows = [
+                (link, title, new_text)
+                for link, title, text in self.iter_texts(links[i:i + chunk])
+                for new_text in (transform(text),)
+                if new_text != text
+            ]
+            if rows:
+                self.put_many(rows, fetched=False)
+                changed += len(rows)
+        return changed
+
+    def touch(self, links):
+        # 重新下载后内容没有变化，只更新下载时间
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE chapters SET fetched_at = ? WHERE link = ?", [(time.time(), link) for link in links]
+            )
+
+    def content_info(self, links):
+        # 返回 {link: (摘要, 大小)}，只包含有内容的章节
+        links = list(links)
+        info = {}
+        for i in range(0, len(links), 500):
+            part = links[i:i + 500]
+            info.update(
+                (link, (digest, size))
+                for link, digest, size in self._conn.execute(
+                    f"SELECT link, digest, size FROM chapters WHERE digest IS NOT NULL "
+                    f"AND link IN ({','.join('?' * len(part))})",
+                    part,
+                )
+            )
+        return info
+
+    def chapter_stats(self):
+        # 目录中已下载章节的 (link, title, size, fetched_at)，按目录顺序，不读取正文
+        return self._conn.execute(
+            "SELECT link, title, size, fetched_at FROM chapters "
+            "WHERE seq IS NOT NULL AND digest IS NOT NULL ORDER BY seq"
+        ).fetchall()
+
+    def downloaded_links(self):
+        # 有内容的章节才有摘要，只读摘要列即可判断，不必读取正文
+        rows = self._conn.execute("SELECT link FROM chapters WHERE digest IS NOT NULL")
+        return {row[0] for row in rows}
+
+    def count_downloaded(self):
+        row = self._conn.execute(
+            "SELECT COUNT(*) FROM chapters WHERE seq IS NOT NULL AND digest IS NOT NULL"
+        ).fetchone()
+        return row[0]
+
+    def catalog_counts(self):
+        # (已下载章节数, 目录章节数)，只读覆盖索引
+        total, downloaded = self._conn.execute(
+            "SELECT COUNT(*), COUNT(digest) FROM chapters WHERE seq IS NOT NULL"
+        ).fetchone()
+        return downloaded, total
+
+    def iter_catalog(self):
+        # 按目录顺序逐条返回 (title, text)，不会一次性把整本书读入内存
+        cursor = self._conn.execute(
+            "SELECT title, text FROM chapters WHERE seq IS NOT NULL ORDER BY seq"
+        )
+        for title, text in cursor:
+            yield title, self.codec.decode(text) or ""
+
+    def output_manifest(self):
+        # 当前应当写入输出文件的章节（目录顺序、有内容），只取摘要不读正文
+        return self._conn.execute(
+            "SELECT link, digest FROM chapters WHERE seq IS NOT NULL AND digest IS NOT NULL ORDER BY seq"
+        ).fetchall()
+
+    def volume_manifest(self):
+        # 输出清单加上每章大小，用于分卷
+        return self._conn.execute(
+            "SELECT link, digest, size FROM chapters WHERE seq IS NOT NULL AND digest IS NOT NULL ORDER BY seq"
+        ).fetchall()
+
+    def iter_output_chapters(self, start=0, count=-1):
+        # 按目录顺序返回输出清单中第 start 章起的 count 章 (title, text)
+        cursor = self._conn.execute(
+            "SELECT title, text FROM chapters WHERE seq IS NOT NULL AND digest IS NOT NULL "
+            "ORDER BY seq LIMIT ? OFFSET ?",
+            (count, start),
+        )
+        for title, text in cursor:
+            yield title, self.codec.decode(text)
+
+    def exported_manifest(self):
+        return self._conn.execute("SELECT link, digest FROM exported ORDER BY pos").fetchall()
+
+    def iter_output_texts(self, start=0):
+        cursor = self._conn.execute(
+            "SELECT text FROM chapters WHERE seq IS NOT NULL AND digest IS NOT NULL "
+            "ORDER BY seq LIMIT -1 OFFSET ?",
+            (start,),
+        )
+        for (text,) in cursor:
+            yield self.codec.decode(text)
+
+    def record_export(self, manifest, start, size):
+        with self._conn:
+            self._conn.execute("DELETE FROM exported WHERE pos >= ?", (start,))
+            self._conn.executemany(
+                "INSERT INTO exported (pos, link, digest) VALUES (?, ?, ?)",
+                [(pos, link, digest) for pos, (link, digest) in enumerate(manifest[start:], start)],
+            )
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('export_size', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (str(size),),
+            )
+
+    def recompress(self, mode, chunk=200):
+        # 按新的压缩方式重写全部正文（mode 为 None 时解压为纯文本），完成后整理数据库文件释放空间
+        self.flush()
+        before = self.disk_size()
+        old_codec = self.codec
+        self.codec = TextCodec(mode, dict(self._conn.execute("SELECT dict_id, data FROM dictionaries")))
+        self._dict_checked = False
+        if self.codec.mode == "zstd" and not self.codec.has_dictionary:
+            self._train_dictionary()
+        links = [row[0] for row in self._conn.execute("SELECT link FROM chapters WHERE text IS NOT NULL")]
+        for i in range(0, len(links), chunk):
+            part = links[i:i + chunk]
+            rows = self._conn.execute(
+                f"SELECT link, text FROM chapters WHERE link IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE chapters SET text = ? WHERE link = ?",
+                    [(self.codec.encode(old_codec.decode(text)), link) for link, text in rows],
+                )
+        # WAL 模式下 VACUUM 的结果先写入 -wal 文件，需要再合并一次
+        self._conn.execute("VACUUM")
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return before, self.disk_size()
+
+    def disk_size(self):
+        return sum(
+            os.path.getsize(self.path + suffix)
+            for suffix in ("", "-wal")
+            if os.path.exists(self.path + suffix)
+        )
+
+    def migrate_folder(self, chapter_folder, chapters):
+        # 一次性迁移旧版 chapter/ 目录，兼容 <link>.txt 和更早的 <title>.txt 两种命名
+        if not os.path.isdir(chapter_folder):
+            return 0
+        rows, imported = [], set()
+        for chapter in chapters:
+            for name in (chapter_file_name(chapter.link), chapter.title + ".txt"):
+                path = os.path.join(chapter_folder, name)
+                if os.path.exists(path):
+                    with open(path, "r", encoding="utf-8") as f:
+                        text = f.read()
+                    if text.strip():
+                        rows.append((chapter.link, chapter.title, text))
+                        imported.add(path)
+                        break
+        if rows:
+            self.put_many(rows, fetched=False)
+        for path in imported:
+            os.remove(path)
+        try:
+            os.rmdir(chapter_folder)
+        except OSError:
+            pass
+        return len(rows)
@@ -0,0 +1,1169 @@
+from typing import List
+import os
+import json
+import re
+import shutil
+import time
+import hashlib
+import heapq
+import itertools
+import multiprocessing
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from http_client import CircuitBreaker, FetchError, HttpClient, RateLimiter, backoff_delay, parse_retry_after
+from chapter_store import STORE_FILE_NAME, ChapterStore, text_digest
+from parsers import get_backend
+from search_cache import SearchCache
+from metrics import RunMetrics, write_prometheus
+from epub_writer import write_epub
+from library_db import LibraryDB
+from library_index import LibraryIndex
+from text_cleaner import BOILERPLATE_SAMPLE, TextCleaner, learn_boilerplate, remove_lines
+
+baseUrl = "https://m.lwxsw8.com"
+# 书库文件；旧版的 novel_list.json 在第一次打开书库时自动导入
+LIBRARY_DB_FILE = os.path.join(os.getcwd(), "library.db")
+NOVEL_LIST_FILE = os.path.join(os.getcwd(), "novel_list.json")
+BOOK_DATA_DIR = os.path.join(os.getcwd(), "book_data")
+BOOKS_DIR = os.path.join(os.getcwd(), "books")
+# 并发下载的线程数，以及对站点的全局每秒请求上限（<=0 表示不限速）
+DOWNLOAD_CONCURRENCY = 4
+REQUESTS_PER_SECOND = 4.0
+# 解析与清理正文的进程数：None 为 CPU 核数减一（最多 8 个），0 表示在下载线程中解析
+PARSE_WORKERS = None
+# 批量更新时同时下载的书籍数量，所有书共享同一个全局限速
+UPDATE_PARALLEL_BOOKS = 2
+# 目录缓存的有效期（秒），期间选择或下载同一本书不再请求目录页
+CATALOG_CACHE_TTL = 600
+# HTML 解析后端：None 为自动选择已安装的最快后端，也可指定 "lxml"、"html.parser"
+HTML_PARSER = None
+# 连接池大小与超时（秒）
+HTTP_POOL_SIZE = 16
+HTTP_CONNECT_TIMEOUT = 5
+HTTP_READ_TIMEOUT = 10
+# 失败章节的重试：最多重试次数、指数退避的起始与最大间隔（秒）
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+# 连续失败多少次后暂停所有请求、首次暂停的秒数，以及持续不可用多久后放弃本次下载
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_COOLDOWN = 5.0
+CIRCUIT_GIVE_UP = 600.0
+# 搜索结果缓存：最多保存的关键词数量、有效期（秒）与缓存文件（None 表示只缓存在内存中）
+SEARCH_CACHE_SIZE = 128
+SEARCH_CACHE_TTL = 3600
+SEARCH_CACHE_FILE = os.path.join(os.getcwd(), "search_cache.json")
+# 进度消息合并：每隔多少秒或攒够多少条才回调一次界面
+PROGRESS_INTERVAL = 0.2
+PROGRESS_BATCH = 50
+# 下载结果摘要中最多列出的失败章节数
+REPORT_FAILED_LIMIT = 20
+# 成品文件格式（"txt"、"epub"），以及分卷：每卷最多多少章、多少 MB（0 表示不按该条件分卷）
+OUTPUT_FORMATS = ("txt",)
+VOLUME_CHAPTERS = 0
+VOLUME_MB = 0
+# 导出所有小说时同时处理的书籍数量
+EXPORT_WORKERS = 4
+# 章节正文的压缩方式：None 不压缩，"zstd"（需安装 zstandard，未安装时退回 zlib）或 "zlib"
+CHAPTER_COMPRESSION = None
+# 每次下载后把各书最近一次的指标汇总写成 Prometheus 文本文件，None 表示不写
+METRICS_PROM_FILE = None
+# 正文清理规则文件，运行目录中没有时使用程序自带的 clean_rules.txt
+CLEAN_RULES_FILE = os.path.join(os.getcwd(), "clean_rules.txt")
+# 下载后是否识别各书中反复出现的广告行。识别出的行只在生成成品文件时删除，章节库中保留下载的原文
+LEARN_BOILERPLATE = True
+# 本地全文索引文件，下载中每隔多少秒把新章节加入索引
+LIBRARY_INDEX_FILE = os.path.join(BOOK_DATA_DIR, "library_index.db")
+INDEX_INTERVAL = 10.0
+# 疑似不完整的章节：正文不到 SUSPECT_MIN_BYTES 字节或不到本书章节大小中位数的 SUSPECT_RATIO，
+# 或者不超过 PLACEHOLDER_MAX_BYTES 字节且含有站点“正在更新”之类的占位提示
+SUSPECT_MIN_BYTES = 300
+SUSPECT_RATIO = 0.2
+PLACEHOLDER_MAX_BYTES = 3000
+PLACEHOLDER_PATTERN = r"正在(?:更新|手打|努力)|更新中|稍后(?:再来|刷新|再看)|内容(?:缺失|为空|加载中)|请过几分钟"
+
+class Chapter:
+    # 目录中的一章只记录标题和链接，正文保存在章节库中，合并时按顺序逐章读取
+    __slots__ = ("title", "link")
+
+    def __init__(self, title, link):
+        self.title = title
+        self.link = link
+
+    def __repr__(self):
+        return f"Chapter(title={self.title!r}, link={self.link!r})"
+
+rate_limiter = RateLimiter(REQUESTS_PER_SECOND)
+client = HttpClient(
+    pool_size=max(HTTP_POOL_SIZE, DOWNLOAD_CONCURRENCY),
+    connect_timeout=HTTP_CONNECT_TIMEOUT,
+    read_timeout=HTTP_READ_TIMEOUT,
+    limiter=rate_limiter,
+)
+circuit_breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN, RETRY_MAX_DELAY, CIRCUIT_GIVE_UP)
+search_cache = SearchCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, SEARCH_CACHE_FILE)
+library_index = LibraryIndex(LIBRARY_INDEX_FILE)
+library = LibraryDB(LIBRARY_DB_FILE, NOVEL_LIST_FILE)
+
+# 解析后端在第一次使用时才创建，避免只做导出等操作时也导入 lxml
+html_parser = None
+text_cleaner = None
+
+def get_html_parser():
+    global html_parser
+    if html_parser is None:
+        html_parser = get_backend(HTML_PARSER)
+    return html_parser
+
+def get_text_cleaner():
+    global text_cleaner
+    if text_cleaner is None:
+        text_cleaner = TextCleaner.from_file(CLEAN_RULES_FILE)
+    return text_cleaner
+
+# 解析进程池在第一次下载时才启动，所有书共用
+parse_pool = None
+parse_pool_lock = threading.Lock()
+
+def parse_worker_count():
+    if PARSE_WORKERS is not None:
+        return max(0, PARSE_WORKERS)
+    return min(8, (os.cpu_count() or 1) - 1)
+
+def get_parse_pool():
+    # 使用 spawn 启动子进程：下载时已有多个线程，fork 出的子进程可能继承被锁住的锁
+    global parse_pool
+    with parse_pool_lock:
+        if parse_pool is None and parse_worker_count() > 0:
+            parse_pool = ProcessPoolExecutor(
+                parse_worker_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_parse_worker,
+                initargs=(HTML_PARSER, CLEAN_RULES_FILE),
+            )
+        return parse_pool
+
+def shutdown_parse_pool():
+    global parse_pool
+    with parse_pool_lock:
+        if parse_pool is not None:
+            parse_pool.shutdown(wait=False, cancel_futures=True)
+            parse_pool = None
+
+def init_parse_worker(parser_name, rules_file):
+    # 子进程中的配置与主进程保持一致（命令行或界面可能在运行时修改过）
+    global HTML_PARSER, CLEAN_RULES_FILE
+    HTML_PARSER, CLEAN_RULES_FILE = parser_name, rules_file
+
+def ensure_dirs():
+    os.makedirs(BOOK_DATA_DIR, exist_ok=True)
+    os.makedirs(BOOKS_DIR, exist_ok=True)
+
+def open_book_store(base_folder):
+    # 打开书籍的章节库；凡是可能写入正文的地方（下载、迁移旧章节文件、重新清理）都按配置的方式压缩
+    return ChapterStore.for_book(base_folder, compression=CHAPTER_COMPRESSION)
+
+def extract_chapters(html_content: str) -> List[Chapter]:
+    chapters = []
+
+    for href, title in get_html_parser().catalog_links(html_content):
+        if title == "↓↓↓ 直达页面底部":
+            continue
+        if href and title != "":
+            chapter = Chapter(title=title, link=href)
+            chapters.append(chapter)
+    
+    return chapters
+
+def get_html(url: str, metrics=None) -> str:
+    response = client.get(url)
+    if metrics is not None:
+        metrics.add("requests")
+        metrics.add("bytes", response.wire_bytes)
+        metrics.observe("throttle", response.throttle_wait)
+        metrics.observe("fetch", response.fetch_time)
+    if response.status_code == 200:
+        return response.text
+    else:
+        raise FetchError(response.status_code, parse_retry_after(response.headers.get("Retry-After")))
+
+def get_catalog_response(url, headers=None):
+    # 目录页请求失败时按指数退避重试，站点给出 Retry-After 时至少等待该时长
+    for attempt in range(MAX_RETRIES + 1):
+        retry_after = None
+        try:
+            response = client.get(url, headers=headers)
+            if response.status_code in (200, 304):
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            raise FetchError(response.status_code, retry_after)
+        except Exception as e:
+            if attempt == MAX_RETRIES or getattr(e, "permanent", False):
+                raise
+        time.sleep(max(backoff_delay(attempt, RETRY_BASE_DELAY, RETRY_MAX_DELAY), retry_after or 0))
+
+def failure_kind(error):
+    # 返回 (是否计入断路器, 是否重试)。只有 429、5xx 和连接、超时错误说明站点本身有问题，计入断路器；
+    # 404 等永久性错误直接失败，解析出错、内容为空等只重试本章
+    if isinstance(error, FetchError):
+        return not error.permanent, not error.permanent
+    return isinstance(error, OSError), True
+
+def unique_chapters(chapters):
+    # 目录页中重复出现的链接（例如页首的“最新章节”）只保留最后一次，与章节库中 seq 的取值一致；
+    # 下载时按链接定位写入顺序，重复的链接会让前一个位置永远等不到内容
+    last = {chapter.link: pos for pos, chapter in enumerate(chapters)}
+    return [chapter for pos, chapter in enumerate(chapters) if last[chapter.link] == pos]
+
+def load_catalog(store, url, max_age=None, response=None):
+    # 目录缓存在书籍的章节库中：有效期内直接使用，过期后带 ETag / Last-Modified 条件请求，
+    # 内容摘要未变时不重新解析。response 为已经取得的目录页响应（见 first_catalog_response）
+    if max_age is None:
+        max_age = CATALOG_CACHE_TTL
+    cached = store.get_meta("catalog_url") == url
+    if cached and time.time() - float(store.get_meta("catalog_checked_at", 0)) < max_age:
+        chapters = [Chapter(title=title, link=link) for link, title in store.catalog_chapters()]
+        if chapters:
+            return chapters
+    headers = {}
+    if cached:
+        if store.get_meta("catalog_etag"):
+            headers["If-None-Match"] = store.get_meta("catalog_etag")
+        if store.get_meta("catalog_last_modified"):
+            headers["If-Modified-Since"] = store.get_meta("catalog_last_modified")
+    if response is None:
+        response = get_catalog_response(url, headers)
+    chapters = None
+    if response.status_code == 304:
+        chapters = [Chapter(title=title, link=link) for link, title in store.catalog_chapters()]
+        digest = store.get_meta("catalog_hash")
+    else:
+        html_content = response.text
+        digest = hashlib.sha1(html_content.encode("utf-8")).hexdigest()
+        if cached and digest == store.get_meta("catalog_hash"):
+            chapters = [Chapter(title=title, link=link) for link, title in store.catalog_chapters()]
+        if not chapters:
+            chapters = unique_chapters(extract_chapters(html_content))
+            store.sync_catalog(chapters)
+    store.set_meta("catalog_url", url)
+    store.set_meta("catalog_hash", digest or "")
+    store.set_meta("catalog_etag", response.headers.get("ETag", ""))
+    store.set_meta("catalog_last_modified", response.headers.get("Last-Modified", ""))
+    store.set_meta("catalog_checked_at", time.time())
+    return chapters
+
+def first_catalog_response(base_folder, url):
+    # 本书还没有章节库时先取目录页再创建章节库，目录页打不开时抛出异常，不会留下空的章节库；
+    # 已有章节库时返回 None，由 load_catalog 按缓存和条件请求处理
+    if os.path.exists(os.path.join(base_folder, STORE_FILE_NAME)):
+        return None
+    return get_catalog_response(url)
+
+def parse_chapter_html(html_content):
+    # 解析并清理正文，返回 (正文, 解析耗时, 清理耗时)；在解析进程中执行
+    start = time.perf_counter()
+    text = get_html_parser().chapter_text(html_content)
+    parsed = time.perf_counter()
+    if text is not None:
+        text = get_text_cleaner().clean(text)
+    return text or "", parsed - start, time.perf_counter() - parsed
+
+def extract_chapter_text(html_content, metrics=None):
+    text, parse_s, clean_s = parse_chapter_html(html_content)
+    if metrics is not None:
+        metrics.observe("parse", parse_s)
+        metrics.observe("clean", clean_s)
+    return text
+
+def fetch_chapter_html(chapter, metrics=None):
+    return get_html(baseUrl + chapter.link, metrics)
+
+def fetch_chapter_text(chapter, metrics=None):
+    return extract_chapter_text(fetch_chapter_html(chapter, metrics), metrics)
+
+def load_boilerplate(store):
+    return set(json.loads(store.get_meta("boilerplate", "[]")))
+
+def output_cleaner(store):
+    # 返回 (生成成品文件时处理正文的函数, 广告行版本)；学到的广告行变化时版本随之变化，成品文件需要重建
+    boilerplate = load_boilerplate(store) if LEARN_BOILERPLATE else set()
+    if not boilerplate:
+        return (lambda text: text), ""
+    version = hashlib.sha1("\n".join(sorted(boilerplate)).encode("utf-8")).hexdigest()
+    return (lambda text: remove_lines(text, boilerplate).strip()), version
+
+def learn_book_boilerplate(store, cleaner=None):
+    # 从本书抽样的章节中找出反复出现的整行广告，并入已记录的行，返回 (全部广告行, 新增行数)。
+    # 指定 cleaner 时先按新规则清理样本，已被规则删除的行不会再被记录
+    known = load_boilerplate(store)
+    texts = store.sample_texts(BOILERPLATE_SAMPLE)
+    if cleaner is not None:
+        texts = [cleaner.clean(text, known) for text in texts]
+    new = learn_boilerplate(texts) - known
+    if new:
+        known |= new
+        store.set_meta("boilerplate", json.dumps(sorted(known), ensure_ascii=False))
+    return known, len(new)
+
+def looks_like_placeholder(text):
+    return len(text.encode("utf-8")) <= PLACEHOLDER_MAX_BYTES and re.search(PLACEHOLDER_PATTERN, text) is not None
+
+def find_suspect_chapters(store):
+    # 返回疑似不完整的章节 [(link, title, size, fetched_at, 原因)]，按目录顺序；
+    # 大小只读元数据，只有较短的章节才读取正文检查占位提示
+    stats = store.chapter_stats()
+    if not stats:
+        return []
+    sizes = sorted(size or 0 for _, _, size, _ in stats)
+    threshold = max(SUSPECT_MIN_BYTES, sizes[len(sizes) // 2] * SUSPECT_RATIO)
+    reasons = {link: "过短" for link, _, size, _ in stats if (size or 0) < threshold}
+    short = [link for link, _, size, _ in stats if (size or 0) <= PLACEHOLDER_MAX_BYTES]
+    for link, _, text in store.iter_texts(short):
+        if text and re.search(PLACEHOLDER_PATTERN, text):
+            reasons[link] = "占位内容"
+    return [
+        (link, title, size, fetched_at, reasons[link])
+        for link, title, size, fetched_at in stats
+        if link in reasons
+    ]
+
+def repair_targets(title, info, recent=0, verify_all=False):
+    # 修复时需要重新下载的章节：疑似不完整的章节，加上目录最后 recent 章（作者常修改最近的章节）或全部章节。
+    # 返回 (疑似章节列表, 链接集合)；本书尚未下载时返回 None
+    base_folder = os.path.join(BOOK_DATA_DIR, title)
+    if not os.path.exists(os.path.join(base_folder, STORE_FILE_NAME)):
+        return None
+    with open_book_store(base_folder) as store:
+        chapters = load_catalog(store, info["url"])
+        suspects = find_suspect_chapters(store)
+    links = {suspect[0] for suspect in suspects}
+    if verify_all:
+        links.update(chapter.link for chapter in chapters)
+    elif recent > 0:
+        links.update(chapter.link for chapter in chapters[-recent:])
+    return suspects, links
+
+def merge_chapters(store, output_file, incremental=True):
+    # 输出文件与上次写入记录一致时只追加新章节，目录重排、中间章节或学到的广告行变化时才整体重写
+    manifest = store.output_manifest()
+    clean, version = output_cleaner(store)
+    start = 0
+    if incremental and os.path.exists(output_file) and store.get_meta("export_boilerplate", "") == version:
+        exported = store.exported_manifest()
+        if (
+            manifest[:len(exported)] == exported
+            and str(os.path.getsize(output_file)) == store.get_meta("export_size")
+        ):
+            start = len(exported)
+    if start and start == len(manifest):
+        return 0, False
+    if start:
+        with open(output_file, "a", encoding="utf-8") as f:
+            for text in map(clean, store.iter_output_texts(start)):
+                if text:
+                    f.write(text + "\n\n------------\n\n")
+    else:
+        with open(output_file, "w", encoding="utf-8") as f:
+            for chapter_title, text in store.iter_catalog():
+                text = clean(text)
+                if text.strip():
+                    f.write(text + "\n\n------------\n\n")
+                else:
+                    print(f"章节 {chapter_title} 没有内容，跳过。")
+    store.record_export(manifest, start, os.path.getsize(output_file))
+    store.set_meta("export_boilerplate", version)
+    return len(manifest) - start, start == 0
+
+def plan_volumes(manifest):
+    # 按章数或大小把输出清单切分成卷，返回每卷的 (起始位置, 章数, 内容摘要)。
+    # 切分只取决于前面的章节，追加新章节时只影响最后一卷
+    limit_bytes = VOLUME_MB * 1048576
+    volumes, start, size = [], 0, 0
+    for pos, (_, _, chapter_size) in enumerate(manifest):
+        count = pos - start
+        if count and (
+            (VOLUME_CHAPTERS and count >= VOLUME_CHAPTERS)
+            or (limit_bytes and size + (chapter_size or 0) > limit_bytes)
+        ):
+            volumes.append((start, count))
+            start, size = pos, 0
+        size += chapter_size or 0
+    if len(manifest) > start:
+        volumes.append((start, len(manifest) - start))
+    planned = []
+    for start, count in volumes:
+        digest = hashlib.sha1()
+        for link, chapter_digest, _ in manifest[start:start + count]:
+            digest.update(f"{link}\0{chapter_digest}\n".encode("utf-8"))
+        planned.append((start, count, digest.hexdigest()))
+    return planned
+
+def write_txt_volume(path, texts):
+    with open(path, "w", encoding="utf-8") as f:
+        for text in texts:
+            if text:
+                f.write(text + "\n\n------------\n\n")
+
+def build_outputs(store, title, author, output_folder):
+    # 按 OUTPUT_FORMATS 和分卷设置生成成品文件，只重建内容有变化的卷，
+    # 返回 (成品文件列表, 说明)。不分卷的 txt 仍由 merge_chapters 增量追加
+    split = bool(VOLUME_CHAPTERS or VOLUME_MB)
+    outputs, notes = [], []
+    clean, version = output_cleaner(store)
+    # 不分卷时整本书就是一卷
+    volumes = plan_volumes(store.volume_manifest()) if split or "epub" in OUTPUT_FORMATS else []
+    for fmt in OUTPUT_FORMATS:
+        if fmt == "txt" and not split:
+            output_file = os.path.join(output_folder, f"{title}.txt")
+            written, rewritten = merge_chapters(store, output_file)
+            if rewritten:
+                notes.append(f"输出文件已重新生成，共 {written} 章。")
+            elif written:
+                notes.append(f"输出文件已追加 {written} 章。")
+            outputs.append(output_file)
+            continue
+        rebuilt = 0
+        for idx, (start, count, digest) in enumerate(volumes, 1):
+            suffix = f"_{idx:03d}" if split else ""
+            output_file = os.path.join(output_folder, f"{title}{suffix}.{fmt}")
+            outputs.append(output_file)
+            key = f"volume:{fmt}:{idx if split else 0}"
+            if version:
+                digest = f"{digest}:{version}"
+            if os.path.exists(output_file) and store.get_meta(key) == digest:
+                continue
+            chapters = ((chapter_title, clean(text)) for chapter_title, text in store.iter_output_chapters(start, count))
+            if fmt == "epub":
+                volume_title = f"{title} 第{idx}卷" if split else title
+                write_epub(output_file, volume_title, author, chapters, f"urn:novel-download:{title}:{idx}")
+            else:
+                write_txt_volume(output_file, (text for _, text in chapters))
+            store.set_meta(key, digest)
+            rebuilt += 1
+        if rebuilt:
+            notes.append(f"{fmt} 已重新生成 {rebuilt} 个文件，共 {len(volumes)} 个。")
+    # 删除不再属于当前设置的旧成品文件（例如卷数减少或改变了格式）
+    current = {os.path.basename(path) for path in outputs}
+    for name in os.listdir(output_folder):
+        if name.startswith(title) and name.endswith((".txt", ".epub")) and name not in current:
+            os.remove(os.path.join(output_folder, name))
+    return outputs, notes
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def same_content(src, dst):
+    # 大小和修改时间一致视为未变；大小相同而时间不同时比较内容摘要，一致则同步修改时间，下次不必再读
+    src_stat, dst_stat = os.stat(src), os.stat(dst)
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    if src_stat.st_mtime_ns == dst_stat.st_mtime_ns:
+        return True
+    if file_digest(src) != file_digest(dst):
+        return False
+    os.utime(dst, ns=(dst_stat.st_atime_ns, src_stat.st_mtime_ns))
+    return True
+
+def reflink(src, dst):
+    # Linux 上支持写时复制的文件系统（btrfs、xfs 等）通过 FICLONE 共享数据块
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), 0x40049409, fsrc.fileno())
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+def link_or_copy(src, dst):
+    # 导出目录优先使用硬链接，与输出文件共享数据；不支持时尝试写时复制，最后才完整复制。
+    # 返回 "skipped"（内容未变）、"linked"、"cloned" 或 "copied"
+    if os.path.exists(dst):
+        if os.path.samefile(src, dst) or same_content(src, dst):
+            return "skipped"
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return "linked"
+    except OSError:
+        pass
+    if reflink(src, dst):
+        return "cloned"
+    shutil.copy2(src, dst)
+    return "copied"
+
+def record_book_stats(title, store, outputs=None, **stats):
+    # 把章节库中的章节数、目录检查时间和文件大小写入书库，outputs 为本书的成品文件
+    downloaded, total = store.catalog_counts()
+    stats.update(downloaded_chapters=downloaded, total_chapters=total, store_size=store.disk_size())
+    checked = store.get_meta("catalog_checked_at")
+    if checked:
+        stats["last_checked"] = float(checked)
+    if outputs is not None:
+        stats["output_size"] = sum(os.path.getsize(path) for path in outputs if os.path.exists(path))
+    library.update_stats(title, **stats)
+
+def delete_book(title):
+    # 删除小说的数据文件夹、books 中的成品文件（各格式和分卷）、全文索引和书库中的记录
+    book = library.get(title)
+    shutil.rmtree(os.path.join(BOOK_DATA_DIR, title), ignore_errors=True)
+    if os.path.isdir(BOOKS_DIR):
+        remove_stale_books(title, book["author"] if book else "", [])
+    library_index.remove_book(title)
+    library.remove(title)
+
+def search_novel(keyword, use_cache=True):
+    # 相同关键词在有效期内直接返回缓存结果，不再请求站点；请求失败时抛出 FetchError，不写入缓存
+    if use_cache:
+        results = search_cache.get(keyword)
+        if results is not None:
+            return results
+    results = fetch_search_results(keyword)
+    search_cache.put(keyword, results)
+    return results
+
+def format_search_cache_stats():
+    stats = search_cache.stats()
+    return (
+        f"搜索缓存：命中 {stats['hits']} 次，未命中 {stats['misses']} 次，"
+        f"淘汰 {stats['evictions']} 条，现有 {stats['entries']} 条"
+    )
+
+def search_library(keyword, limit=50, progress=None):
+    # 在已下载的书中搜索书名、章节标题和正文，先补齐章节库有变化的书的索引
+    library_index.sync_library(library.novel_list(), BOOK_DATA_DIR, progress)
+    return library_index.search(keyword, BOOK_DATA_DIR, limit)
+
+def fetch_search_results(keyword):
+    from bs4 import BeautifulSoup
+    url = baseUrl + "/search/"
+    data = {
+        "searchkey": keyword,
+        "searchtype": "all",
+        "t_btnsearch": ""
+    }
+    resp = client.post(url, data=data)
+    # 限流或站点出错时的页面解析不出结果，不能当作“没有找到”返回并被缓存
+    if resp.status_code != 200:
+        raise FetchError(resp.status_code, parse_retry_after(resp.headers.get("Retry-After")))
+    resp.encoding = "utf-8"
+    soup = BeautifulSoup(resp.text, "html.parser")
+    results = []
+    for table in soup.find_all("table", class_="list-item"):
+        a_title = table.find("div", class_="article").find("a", href=True)
+        if not a_title:
+            continue
+        name = a_title.get_text(strip=True)
+        link = a_title["href"]
+        if not link.endswith("/"):
+            continue
+        author = ""
+        p = table.find("p", class_="fs12 gray")
+        if p:
+            author = p.get_text(strip=True)
+            author = re.sub(r"阅读:\d+", "", author).strip()
+            author = re.sub(r"作者:", "", author).strip()
+        desc_a = table.find_all("a", href=True)
+        desc = ""
+        if len(desc_a) > 1:
+            desc = desc_a[-1].get_text(strip=True)
+        results.append({
+            "name": name,
+            "url": baseUrl + link + "all.html",
+            "author": author,
+            "desc": desc
+        })
+    return results
+
+def books_file(title, author, output_file):
+    # books 中的文件名在书名后加上作者，保留分卷序号和扩展名
+    author_str = f"({author})" if author else ""
+    return os.path.join(BOOKS_DIR, title + author_str + os.path.basename(output_file)[len(title):])
+
+def remove_stale_books(title, author, keep):
+    # 删除 books 中本书旧设置留下的成品文件（书名(作者)[_卷号].txt/.epub）
+    author_str = f"({author})" if author else ""
+    pattern = re.compile(re.escape(title + author_str) + r"(_\d{3})?\.(txt|epub)")
+    keep = {os.path.basename(path) for path in keep}
+    for name in os.listdir(BOOKS_DIR):
+        if pattern.fullmatch(name) and name not in keep:
+            os.remove(os.path.join(BOOKS_DIR, name))
+
+def export_book(title, info):
+    # 先按当前格式与分卷设置补齐成品文件（未变化的卷不会重建），再导出到 books
+    author = info.get("author", "")
+    base_folder = os.path.join(BOOK_DATA_DIR, title)
+    output_folder = os.path.join(base_folder, "output")
+    if os.path.exists(os.path.join(base_folder, STORE_FILE_NAME)):
+        with open_book_store(base_folder) as store:
+            # 还没有下载任何章节的书（例如目录页曾经打不开）不生成空的成品文件
+            if not store.count_downloaded():
+                return "missing"
+            os.makedirs(output_folder, exist_ok=True)
+            outputs, _ = build_outputs(store, title, author, output_folder)
+            record_book_stats(title, store, outputs)
+    else:
+        outputs = [os.path.join(output_folder, f"{title}.txt")]
+    outputs = [path for path in outputs if os.path.exists(path)]
+    if not outputs:
+        return "missing"
+    books_files = [books_file(title, author, path) for path in outputs]
+    results = [link_or_copy(path, books_path) for path, books_path in zip(outputs, books_files)]
+    remove_stale_books(title, author, books_files)
+    changed = [result for result in results if result != "skipped"]
+    return changed[0] if changed else "skipped"
+
+def export_all_books(progress=None):
+    # 并行导出书库中的所有小说到 books 文件夹，未变化的书直接跳过，返回各结果的数量
+    progress = progress or (lambda current, total, msg: None)
+    messages = {
+        "skipped": "未变化，跳过",
+        "linked": "已导出（硬链接）",
+        "cloned": "已导出（写时复制）",
+        "copied": "已导出",
+        "missing": "未找到成品文件，跳过",
+    }
+    summary = {key: 0 for key in messages}
+    summary["errors"] = []
+    books = library.books()
+    total = len(books)
+    with ThreadPoolExecutor(max_workers=EXPORT_WORKERS) as pool:
+        futures = {pool.submit(export_book, book["title"], book): book["title"] for book in books}
+        for done, future in enumerate(as_completed(futures), 1):
+            title = futures[future]
+            # 单本书出错（文件读写失败、章节库损坏等）只记入 errors，不影响其他书
+            try:
+                result = future.result()
+            except Exception as e:
+                summary["errors"].append((title, str(e)))
+                progress(done, total, f"《{title}》导出失败: {e}")
+                continue
+            summary[result] += 1
+            progress(done, total, f"《{title}》{messages[result]}")
+    return summary
+
+def format_export_summary(summary):
+    # 导出中途出错时 summary 可能只有 errors
+    exported = sum(summary.get(key, 0) for key in ("linked", "cloned", "copied"))
+    lines = [f"导出 {exported} 本，未变化 {summary.get('skipped', 0)} 本，缺少成品文件 {summary.get('missing', 0)} 本"]
+    for title, error in summary["errors"]:
+        lines.append(f"《{title}》导出失败: {error}")
+    return "\n".join(lines)
+
+def compress_library(novel_list, mode, progress=None):
+    # 按指定方式重写所有已保存小说的章节正文，返回 (压缩前字节数, 压缩后字节数)
+    progress = progress or (lambda current, total, msg: None)
+    before_total, after_total = 0, 0
+    for idx, title in enumerate(novel_list, 1):
+        base_folder = os.path.join(BOOK_DATA_DIR, title)
+        if not os.path.exists(os.path.join(base_folder, STORE_FILE_NAME)):
+            continue
+        with ChapterStore.for_book(base_folder) as store:
+            before, after = store.recompress(mode)
+            library.update_stats(title, store_size=after)
+        before_total += before
+        after_total += after
+        progress(idx, len(novel_list), f"《{title}》{before / 1048576:.1f} MB -> {after / 1048576:.1f} MB")
+    return before_total, after_total
+
+def clean_library(novel_list, progress=None, reset_boilerplate=False):
+    # 用当前的清理规则重新清理所有已下载的章节并重新识别广告行，有改动的书重新生成成品文件并导出。
+    # reset_boilerplate 时清空各书学到的广告行且本次不再识别，误删的行在成品文件中恢复。
+    # 返回 {"books": 有改动的书数, "chapters": 改动的章节数, "lines": 新识别的广告行数}
+    global text_cleaner
+    progress = progress or (lambda current, total, msg: None)
+    text_cleaner = cleaner = TextCleaner.from_file(CLEAN_RULES_FILE)
+    # 解析进程在启动时加载规则，关闭后下次下载会用新规则重新启动
+    shutdown_parse_pool()
+    summary = {"books": 0, "chapters": 0, "lines": 0}
+    for idx, (title, info) in enumerate(novel_list.items(), 1):
+        base_folder = os.path.join(BOOK_DATA_DIR, title)
+        if not os.path.exists(os.path.join(base_folder, STORE_FILE_NAME)):
+            continue
+        with open_book_store(base_folder) as store:
+            changed = store.rewrite_texts(cleaner.clean)
+            forgotten, learned = 0, 0
+            if reset_boilerplate:
+                forgotten = len(load_boilerplate(store))
+                store.set_meta("boilerplate", "[]")
+            elif LEARN_BOILERPLATE:
+                _, learned = learn_book_boilerplate(store, cleaner)
+            store.checkpoint()
+        if changed or learned or forgotten:
+            export_book(title, info)
+            summary["books"] += 1
+        summary["chapters"] += changed
+        summary["lines"] += learned
+        progress(idx, len(novel_list), f"《{title}》清理了 {changed} 章")
+    return summary
+
+class ProgressBatcher:
+    # 把逐章的进度消息合并后回调 callback(current, total, msgs)，
+    # 章节很多时界面每秒只收到少量批次；结束时需调用 flush 送出剩余消息。
+    # 新消息到来时才检查间隔，长时间没有新消息（例如断路器暂停）时由调用方定期 flush(due_only=True)
+    def __init__(self, callback, interval=None, max_batch=None):
+        self.callback = callback
+        self.interval = PROGRESS_INTERVAL if interval is None else interval
+        self.max_batch = max_batch or PROGRESS_BATCH
+        self._lock = threading.Lock()
+        self._msgs = []
+        self._current, self._total = 0, 0
+        self._last_flush = time.monotonic()
+
+    def __call__(self, current, total, msg):
+        with self._lock:
+            self._msgs.append(msg)
+            self._current, self._total = current, total
+            if (len(self._msgs) < self.max_batch and current < total
+                    and time.monotonic() - self._last_flush < self.interval):
+                return
+            batch = self._take()
+        self.callback(*batch)
+
+    def _take(self):
+        msgs, self._msgs = self._msgs, []
+        self._last_flush = time.monotonic()
+        return self._current, self._total, msgs
+
+    def flush(self, due_only=False):
+        # due_only 时只在距上次送出已超过间隔时才送出，供下载循环定期调用
+        with self._lock:
+            if not self._msgs or (due_only and time.monotonic() - self._last_flush < self.interval):
+                return
+            batch = self._take()
+        self.callback(*batch)
+
+class BookDownloader:
+    # 单本书的下载逻辑，不依赖 Qt；DownloadThread 和批量更新都通过它下载。
+    # refetch 为需要重新下载的已有章节链接（修复模式），内容摘要没有变化的章节不会改写
+    def __init__(self, title, url, author, concurrency=None, progress=None, refetch=None):
+        self.title = title
+        self.url = url
+        self.author = author
+        self.refetch = set(refetch or ())
+        self.concurrency = max(1, concurrency or DOWNLOAD_CONCURRENCY)
+        self._progress = progress or (lambda current, total, msg: None)
+        self._stopped = False
+        self.metrics = RunMetrics(title)
+
+    def stop(self):
+        self._stopped = True
+
+    def _flush_progress(self):
+        # 进度回调为 ProgressBatcher 时，缓冲中的消息到了间隔就送出，不必等下一条消息
+        flush = getattr(self._progress, "flush", None)
+        if flush is not None:
+            flush(due_only=True)
+
+    def run(self):
+        title, novel_url = self.title, self.url
+        base_folder = os.path.join(BOOK_DATA_DIR, title)
+        output_folder = os.path.join(base_folder, "output")
+        chapter_folder = os.path.join(base_folder, "chapter")
+        os.makedirs(output_folder, exist_ok=True)
+        store = open_book_store(base_folder)
+        try:
+            result = self._run(store, novel_url, chapter_folder, output_folder)
+        finally:
+            store.close()
+        # 每本书保存最近一次下载的指标，可选汇总为 Prometheus 文本文件
+        self.metrics.finish()
+        self.metrics.save(base_folder)
+        if METRICS_PROM_FILE:
+            write_prometheus(METRICS_PROM_FILE, BOOK_DATA_DIR)
+        return result
+
+    def _run(self, store, novel_url, chapter_folder, output_folder):
+        title, author = self.title, self.author
+        metrics = self.metrics
+        with metrics.timed("catalog"):
+            chapters = load_catalog(store, novel_url)
+        store.migrate_folder(chapter_folder, chapters)
+        # 已下载的章节以章节库为准，只查询摘要列，不读取正文
+        downloaded_set = store.downloaded_links()
+        to_download = [
+            chapter for chapter in chapters if chapter.link not in downloaded_set or chapter.link in self.refetch
+        ]
+        # 重新下载的章节与原有内容的 (摘要, 大小) 比较，未变化的只更新下载时间
+        previous = store.content_info(self.refetch) if self.refetch else {}
+        unchanged = []
+        success, fail, placeholders = 0, 0, 0
+        # 只返回简短摘要，不保存每一章的进度消息
+        report = {"failed": [], "notes": [], "changed": 0, "unchanged": 0}
+        start = time.time()
+        run_started = time.monotonic()
+        total, done = len(to_download), 0
+        pending = deque(to_download)
+        # 失败的章节进入延迟重试队列 (可重试时间, 序号, 章节)，按指数退避或 Retry-After 重新排队
+        retry_queue = []
+        retry_seq = itertools.count()
+        attempts = {}
+        # 流水线：下载线程只取网页，解析和清理交给进程池，本线程按目录顺序写入章节库。
+        # in_flight 记录 {future: (阶段, 章节)}，阶段为 fetch（只取网页）、parse（解析进程）或 text（线程中取网页并解析）。
+        # 在途网页数量有上限，解析跟不上时不再发出新请求，内存中最多只有这么多页面
+        parse_pool = get_parse_pool()
+        max_fetching = self.concurrency * 2
+        max_in_flight = max_fetching + parse_worker_count() * 2
+        in_flight = {}
+        fetching = 0
+        # 写入按目录顺序进行：ready 暂存先完成的后续章节，skipped 为已失败或等待重试、不再阻塞后续章节的位置
+        position = {chapter.link: pos for pos, chapter in enumerate(to_download)}
+        ready, skipped = {}, set()
+        next_pos = 0
+        aborted = False
+        last_indexed = time.monotonic()
+
+        def write(chapter, text):
+            nonlocal success, done, placeholders
+            placeholder = looks_like_placeholder(text)
+            status = "已下载"
+            old = previous.get(chapter.link)
+            # 站点临时返回的占位页比原有正文短时不覆盖原有正文
+            if old is not None and (
+                text_digest(text) == old[0] or (placeholder and len(text.encode("utf-8")) < (old[1] or 0))
+            ):
+                unchanged.append(chapter.link)
+                report["unchanged"] += 1
+                status = "内容未变化"
+            else:
+                with metrics.timed("write"):
+                    store.append(chapter.link, chapter.title, text)
+                if old is not None:
+                    report["changed"] += 1
+                    status = "内容已更新"
+                placeholders += placeholder
+            downloaded_set.add(chapter.link)
+            metrics.add("chapters")
+            success += 1
+            done += 1
+            self._progress(done, total, f"[{chapter.title}] ({done}/{total}) {status}")
+
+        def drain():
+            nonlocal next_pos
+            while next_pos < total:
+                if next_pos in ready:
+                    write(*ready.pop(next_pos))
+                elif next_pos in skipped:
+                    skipped.discard(next_pos)
+                else:
+                    break
+                next_pos += 1
+
+        def failed(chapter, error, retry_after, site_error=False, retry=True):
+            nonlocal fail, done
+            metrics.add("errors")
+            # 断路器为所有书共用，只有站点层面的错误才计入，单个章节的坏链接不会暂停其他下载
+            pause = circuit_breaker.record_failure(retry_after) if site_error else 0
+            if pause:
+                metrics.add("circuit_open")
+                self._progress(done, total, f"站点限流或连续访问失败，暂停 {pause:.0f} 秒后试探恢复")
+            attempt = attempts[chapter.link] = attempts.get(chapter.link, 0) + 1
+            if retry and attempt <= MAX_RETRIES and not self._stopped:
+                delay = max(backoff_delay(attempt - 1, RETRY_BASE_DELAY, RETRY_MAX_DELAY), retry_after or 0)
+                heapq.heappush(retry_queue, (time.monotonic() + delay, next(retry_seq), chapter))
+                metrics.add("retries")
+                msg = f"[{chapter.title}] 下载失败（{error}），{delay:.1f} 秒后第 {attempt} 次重试"
+            else:
+                metrics.add("failures")
+                fail += 1
+                done += 1
+                msg = f"[{chapter.title}] ({done}/{total}) 下载失败: {error}"
+                if len(report["failed"]) < REPORT_FAILED_LIMIT:
+                    report["failed"].append(chapter.title)
+            self._progress(done, total, msg)
+            if position[chapter.link] >= next_pos:
+                skipped.add(position[chapter.link])
+
+        def parsed(chapter, text):
+            if not text.strip():
+                failed(chapter, "内容为空", None)
+                return
+            pos = position[chapter.link]
+            if pos < next_pos:
+                write(chapter, text)
+            else:
+                skipped.discard(pos)
+                ready[pos] = (chapter, text)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while True:
+                while not aborted and fetching < max_fetching and len(in_flight) < max_in_flight:
+                    retry_ready = bool(retry_queue) and retry_queue[0][0] <= time.monotonic()
+                    if not retry_ready and not pending:
+                        break
+                    # 站点限流时暂停发出新请求，冷却后由断路器放行探测请求
+                    if not circuit_breaker.allow():
+                        break
+                    chapter = heapq.heappop(retry_queue)[2] if retry_ready else pending.popleft()
+                    if parse_pool is not None:
+                        in_flight[pool.submit(fetch_chapter_html, chapter, metrics)] = ("fetch", chapter)
+                    else:
+                        in_flight[pool.submit(fetch_chapter_text, chapter, metrics)] = ("text", chapter)
+                    fetching += 1
+                if not in_flight:
+                    if aborted or not (pending or retry_queue):
+                        break
+                    wake = max(circuit_breaker.wait_time(), retry_queue[0][0] - time.monotonic() if retry_queue and not pending else 0)
+                    time.sleep(min(0.5, max(0.05, wake)))
+                    completed = ()
+                else:
+                    completed, _ = wait(in_flight, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    stage, chapter = in_flight.pop(future)
+                    if stage != "parse":
+                        fetching -= 1
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        # 解析进程异常退出时关闭进程池，本次下载余下的章节改在下载线程中解析
+                        shutdown_parse_pool()
+                        parse_pool = None
+                        self._progress(done, total, "解析进程异常退出，改为在下载线程中解析")
+                        failed(chapter, "解析进程异常退出", None)
+                        continue
+                    except Exception as e:
+                        failed(chapter, str(e), getattr(e, "retry_after", None), *failure_kind(e))
+                        continue
+                    if stage == "fetch":
+                        circuit_breaker.record_success()
+                        if parse_pool is not None:
+                            try:
+                                in_flight[parse_pool.submit(parse_chapter_html, result)] = ("parse", chapter)
+                                continue
+                            except (BrokenProcessPool, RuntimeError):
+                                # 进程池已损坏或已被关闭（例如重新加载清理规则），余下的章节在本线程中解析
+                                parse_pool = None
+                        parsed(chapter, extract_chapter_text(result, metrics))
+                        continue
+                    if stage == "parse":
+                        result, parse_s, clean_s = result
+                        metrics.observe("parse", parse_s)
+                        metrics.observe("clean", clean_s)
+                    elif result.strip():
+                        circuit_breaker.record_success()
+                    parsed(chapter, result)
+                drain()
+                self._flush_progress()
+                # 下载过程中定期把新章节加入全文索引，本地搜索可以搜到正在下载的书
+                if time.monotonic() - last_indexed >= INDEX_INTERVAL:
+                    self._update_index(store)
+                    last_indexed = time.monotonic()
+                if not aborted and (self._stopped or circuit_breaker.given_up(run_started)):
+                    aborted = True
+                    if self._stopped:
+                        report["notes"].append("用户已手动停止下载。")
+                    else:
+                        report["notes"].append(f"站点持续 {int(CIRCUIT_GIVE_UP)} 秒无法访问，已停止下载。")
+                    # 取消尚未开始的请求，已在途的请求结果仍然保存
+                    for future in [f for f in in_flight if f.cancel()]:
+                        if in_flight.pop(future)[0] != "parse":
+                            fetching -= 1
+        # 中途停止时前面可能还有未完成的章节，已拿到的后续章节照常保存
+        for pos in sorted(ready):
+            write(*ready.pop(pos))
+        unDownload = sum(1 for chapter in chapters if chapter.link not in downloaded_set)
+        if unchanged:
+            store.touch(unchanged)
+        if self.refetch:
+            report["notes"].append(
+                f"重新下载 {report['changed'] + report['unchanged']} 章，其中 {report['changed']} 章内容有变化。"
+            )
+        if placeholders:
+            report["notes"].append(f"{placeholders} 章疑似站点的占位内容，可稍后用修复功能重新下载。")
+        if success and LEARN_BOILERPLATE:
+            with metrics.timed("clean"):
+                _, learned = learn_book_boilerplate(store)
+            if learned:
+                report["notes"].append(f"识别出 {learned} 条重复出现的广告行，生成成品文件时删除。")
+        # 提交剩余章节并把日志合并回数据库文件
+        store.checkpoint()
+        self._update_index(store)
+        with metrics.timed("merge"):
+            outputs, notes = build_outputs(store, title, author, output_folder)
+        # 写入了新的或有变化的章节时记录更新时间
+        if success > report["unchanged"]:
+            record_book_stats(title, store, outputs, last_updated=time.time())
+        else:
+            record_book_stats(title, store, outputs)
+        report["notes"].extend(notes)
+        report["outputs"] = [books_file(title, author, path) for path in outputs]
+        for path, books_path in zip(outputs, report["outputs"]):
+            link_or_copy(path, books_path)
+        remove_stale_books(title, author, report["outputs"])
+        output_file = outputs[0] if outputs else os.path.join(output_folder, f"{title}.txt")
+        books_output_file = report["outputs"][0] if outputs else ""
+        report["elapsed"] = time.time() - start
+        return output_file, books_output_file, success, fail, unDownload, report
+
+
+    def _update_index(self, store):
+        # 索引出错不影响下载，下次本地搜索时会补齐
+        try:
+            with self.metrics.timed("index"):
+                library_index.sync_book(self.title, self.author, store)
+        except sqlite3.Error as e:
+            print(f"更新全文索引失败: {e}")
+
+
+def count_chapters(title, url):
+    # 返回 (已下载章节数, 目录章节数)，目录在缓存有效期内不会重新请求
+    base_folder = os.path.join(BOOK_DATA_DIR, title)
+    response = first_catalog_response(base_folder, url)
+    with open_book_store(base_folder) as store:
+        chapters = load_catalog(store, url, response=response)
+        store.migrate_folder(os.path.join(base_folder, "chapter"), chapters)
+        record_book_stats(title, store)
+        return store.count_downloaded(), len(chapters)
+
+def local_chapter_counts(title):
+    # 只读本地章节库，返回 (已下载章节数, 目录章节数) 并记入书库，不请求目录；本书尚未下载时返回 None
+    path = os.path.join(BOOK_DATA_DIR, title, STORE_FILE_NAME)
+    if not os.path.exists(path):
+        return None
+    with ChapterStore(path) as store:
+        record_book_stats(title, store)
+        return store.catalog_counts()
+
+def check_novel(title, info):
+    # 强制重新检查目录（条件请求），返回待下载章节数和上次检查时间
+    base_folder = os.path.join(BOOK_DATA_DIR, title)
+    response = first_catalog_response(base_folder, info["url"])
+    with open_book_store(base_folder) as store:
+        last_checked = float(store.get_meta("catalog_checked_at", 0))
+        chapters = load_catalog(store, info["url"], max_age=0, response=response)
+        store.migrate_folder(os.path.join(base_folder, "chapter"), chapters)
+        downloaded = store.count_downloaded()
+        record_book_stats(title, store)
+    return {
+        "title": title,
+        "author": info.get("author", ""),
+        "url": info["url"],
+        "total": len(chapters),
+        "pending": len(chapters) - downloaded,
+        "last_checked": last_checked,
+    }
+
+class LibraryUpdater:
+    # 批量更新：先检查所有已保存小说的目录，只把有新章节的书排队，
+    # 待下载章节多、上次检查早的优先，同时下载几本书，共用全局限速
+    def __init__(self, novel_list, parallel=None, progress=None):
+        self.novel_list = dict(novel_list)
+        self.parallel = max(1, parallel or UPDATE_PARALLEL_BOOKS)
+        self._progress = progress or (lambda current, total, msg: None)
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._active = []
+        self._books_done = 0
+
+    def stop(self):
+        self._stopped = True
+        with self._lock:
+            for downloader in self._active:
+                downloader.stop()
+
+    def run(self):
+        start = time.time()
+        summary = {"checked": 0, "queued": 0, "books": [], "errors": []}
+        checks = []
+        total = len(self.novel_list)
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_CONCURRENCY) as pool:
+            futures = {pool.submit(check_novel, title, info): title for title, info in self.novel_list.items()}
+            for future in as_completed(futures):
+                title = futures[future]
+                summary["checked"] += 1
+                try:
+                    result = future.result()
+                    checks.append(result)
+                    msg = f"《{title}》检查完成，待下载 {result['pending']} 章"
+                except Exception as e:
+                    summary["errors"].append((title, f"检查目录失败: {e}"))
+                    msg = f"《{title}》检查目录失败: {e}"
+                self._progress(summary["checked"], total, msg)
+        queue = sorted((c for c in checks if c["pending"] > 0), key=lambda c: (-c["pending"], c["last_checked"]))
+        summary["queued"] = len(queue)
+        if queue and not self._stopped:
+            self._progress(0, len(queue), f"共 {len(queue)} 本小说需要更新")
+            concurrency = max(1, DOWNLOAD_CONCURRENCY // self.parallel)
+            self._books_done = done = 0
+            with ThreadPoolExecutor(max_workers=self.parallel) as pool:
+                futures = {pool.submit(self._download, item, concurrency, len(queue)): item for item in queue}
+                for future in as_completed(futures):
+                    item = futures[future]
+                    self._books_done = done = done + 1
+                    try:
+                        book = future.result()
+                    except Exception as e:
+                        summary["errors"].append((item["title"], f"下载失败: {e}"))
+                        self._progress(done, len(queue), f"《{item['title']}》下载失败: {e}")
+                        continue
+                    if book is None:
+                        continue
+                    summary["books"].append(book)
+                    self._progress(
+                        done, len(queue),
+                        f"《{book['title']}》更新完成：成功 {book['success']}，失败 {book['fail']}，未下载 {book['undownloaded']}",
+                    )
+        summary["new_chapters"] = sum(book["success"] for book in summary["books"])
+        summary["failed_chapters"] = sum(book["fail"] for book in summary["books"])
+        summary["stopped"] = self._stopped
+        summary["elapsed"] = time.time() - start
+        return summary
+
+    def _download(self, item, concurrency, total):
+        if self._stopped:
+            return None
+        title = item["title"]
+
+        def progress(current, count, msg):
+            self._progress(self._books_done, total, f"《{title}》{msg}")
+        if hasattr(self._progress, "flush"):
+            progress.flush = self._progress.flush
+        downloader = BookDownloader(title, item["url"], item["author"], concurrency, progress=progress)
+        with self._lock:
+            self._active.append(downloader)
+        try:
+            _, books_output_file, success, fail, undownloaded, _ = downloader.run()
+        finally:
+            with self._lock:
+                self._active.remove(downloader)
+        return {
+            "title": title,
+            "pending": item["pending"],
+            "success": success,
+            "fail": fail,
+            "undownloaded": undownloaded,
+            "output": books_output_file,
+        }
+
+def format_download_report(report, fail=0):
+    lines = [f"耗时 {int(report['elapsed'])} 秒"]
+    if report["failed"]:
+        more = "等" if fail > len(report["failed"]) else ""
+        lines.append(f"失败章节: {'、'.join(report['failed'])}{more}")
+    return "\n".join(lines)
+
+def format_update_summary(summary):
+    lines = [
+        f"检查 {summary['checked']} 本，需要更新 {summary['queued']} 本，"
+        f"新增章节 {summary['new_chapters']}，失败 {summary['failed_chapters']}，"
+        f"耗时 {int(summary['elapsed'])} 秒"
+    ]
+    if summary["stopped"]:
+        lines.append("用户已手动停止更新。")
+    for book in summary["books"]:
+        lines.append(f"《{book['title']}》新增 {book['success']} 章，未下载 {book['undownloaded']} 章")
+    for title, error in summary["errors"]:
+        lines.append(f"《{title}》{error}")
+    return "\n".join(lines)
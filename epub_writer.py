@@ -0,0 +1,100 @@
+import html
+import re
+import zipfile
+
+# 流式生成 EPUB 3（同时附带 EPUB 2 的 toc.ncx）：章节逐个写入压缩包，内存中只保留目录标题
+
+CONTAINER_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+    '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>'
+    "</container>"
+)
+
+# 压缩包内文件使用固定时间，相同内容总是生成相同的文件
+ZIP_DATE = (2000, 1, 1, 0, 0, 0)
+# XML 中不允许出现的控制字符
+INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+STYLE_CSS = "body { line-height: 1.6; } h2 { text-align: center; } p { text-indent: 2em; margin: 0.3em 0; }"
+
+
+def chapter_xhtml(title, text):
+    title, text = INVALID_XML_CHARS.sub("", title), INVALID_XML_CHARS.sub("", text)
+    paragraphs = "".join(f"<p>{html.escape(line.strip())}</p>" for line in text.splitlines() if line.strip())
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<!DOCTYPE html>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="zh-CN"><head>'
+        f'<title>{html.escape(title)}</title><link rel="stylesheet" type="text/css" href="style.css"/>'
+        f"</head><body><h2>{html.escape(title)}</h2>{paragraphs}</body></html>"
+    )
+
+
+def content_opf(identifier, title, author, items):
+    manifest = "".join(
+        f'<item id="{item_id}" href="{item_id}.xhtml" media-type="application/xhtml+xml"/>' for item_id, _ in items
+    )
+    spine = "".join(f'<itemref idref="{item_id}"/>' for item_id, _ in items)
+    creator = f"<dc:creator>{html.escape(author)}</dc:creator>" if author else ""
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="bookid">'
+        '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+        f'<dc:identifier id="bookid">{html.escape(identifier)}</dc:identifier>'
+        f"<dc:title>{html.escape(title)}</dc:title>{creator}<dc:language>zh-CN</dc:language>"
+        '<meta property="dcterms:modified">2000-01-01T00:00:00Z</meta>'
+        "</metadata><manifest>"
+        '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+        '<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>'
+        '<item id="style" href="style.css" media-type="text/css"/>'
+        f'{manifest}</manifest><spine toc="ncx">{spine}</spine></package>'
+    )
+
+
+def nav_xhtml(title, items):
+    entries = "".join(
+        f'<li><a href="{item_id}.xhtml">{html.escape(chapter_title)}</a></li>' for item_id, chapter_title in items
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<!DOCTYPE html>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" xml:lang="zh-CN">'
+        f"<head><title>{html.escape(title)}</title></head><body>"
+        f'<nav epub:type="toc" id="toc"><h1>目录</h1><ol>{entries}</ol></nav></body></html>'
+    )
+
+
+def toc_ncx(identifier, title, items):
+    points = "".join(
+        f'<navPoint id="p{idx}" playOrder="{idx}"><navLabel><text>{html.escape(chapter_title)}</text></navLabel>'
+        f'<content src="{item_id}.xhtml"/></navPoint>'
+        for idx, (item_id, chapter_title) in enumerate(items, 1)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">'
+        f'<head><meta name="dtb:uid" content="{html.escape(identifier)}"/></head>'
+        f"<docTitle><text>{html.escape(title)}</text></docTitle><navMap>{points}</navMap></ncx>"
+    )
+
+
+def _write(archive, name, data, compress_type=zipfile.ZIP_DEFLATED):
+    archive.writestr(zipfile.ZipInfo(name, date_time=ZIP_DATE), data, compress_type=compress_type)
+
+
+def write_epub(path, title, author, chapters, identifier):
+    # chapters 为按顺序产生 (章节标题, 正文) 的迭代器，每次只处理一章
+    items = []
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        # mimetype 必须是第一个文件且不压缩
+        _write(archive, "mimetype", "application/epub+zip", zipfile.ZIP_STORED)
+        _write(archive, "META-INF/container.xml", CONTAINER_XML)
+        _write(archive, "OEBPS/style.css", STYLE_CSS)
+        for idx, (chapter_title, text) in enumerate(chapters, 1):
+            item_id = f"ch{idx:05d}"
+            _write(archive, f"OEBPS/{item_id}.xhtml", chapter_xhtml(chapter_title, text))
+            items.append((item_id, chapter_title))
+        _write(archive, "OEBPS/content.opf", content_opf(identifier, title, author, items))
+        _write(archive, "OEBPS/nav.xhtml", nav_xhtml(title, items))
+        _write(archive, "OEBPS/toc.ncx", toc_ncx(identifier, title, items))
+    return len(items)
@@ -0,0 +1,592 @@
+import os
+import sys
+import time
+from PyQt6.QtWidgets import (
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
+    QLineEdit, QListView, QTextEdit, QMessageBox, QFileDialog, QProgressBar, QInputDialog
+)
+from PyQt6.QtCore import Qt, QThread, pyqtSignal, QUrl
+from PyQt6.QtGui import QDesktopServices, QMovie
+import core
+from core import (
+    BookDownloader, LibraryUpdater, ProgressBatcher, count_chapters, delete_book, ensure_dirs, export_all_books,
+    format_export_summary,
+    format_download_report, format_update_summary, search_library, search_novel,
+)
+from novel_model import NovelListModel
+
+# 信息栏最多保留的行数，超出后丢弃最早的行
+LOG_MAX_LINES = 2000
+# 剩余时间估算中新测得速度的权重（指数平滑）
+ETA_SMOOTHING = 0.3
+
+class DownloadThread(QThread):
+    # 进度按批次发出：progress(当前, 总数, 这段时间内的消息列表)
+    progress = pyqtSignal(int, int, list)
+    finished = pyqtSignal(str, str, int, int, int, dict)
+    
+    def __init__(self, title, url, author, concurrency=None):
+        super().__init__()
+        self.batcher = ProgressBatcher(self.progress.emit)
+        self.downloader = BookDownloader(title, url, author, concurrency, progress=self.batcher)
+
+    def stop(self):
+        self.downloader.stop()
+
+    def run(self):
+        result = self.downloader.run()
+        self.batcher.flush()
+        self.finished.emit(*result)
+
+class UpdateAllThread(QThread):
+    progress = pyqtSignal(int, int, list)
+    finished = pyqtSignal(dict)
+
+    def __init__(self, novel_list):
+        super().__init__()
+        self.batcher = ProgressBatcher(self.progress.emit)
+        self.updater = LibraryUpdater(novel_list, progress=self.batcher)
+
+    def stop(self):
+        self.updater.stop()
+
+    def run(self):
+        summary = self.updater.run()
+        self.batcher.flush()
+        self.finished.emit(summary)
+
+class ExportThread(QThread):
+    progress = pyqtSignal(int, int, list)
+    finished = pyqtSignal(dict)
+
+    def __init__(self):
+        super().__init__()
+        self.batcher = ProgressBatcher(self.progress.emit)
+
+    def run(self):
+        # 无论是否出错都要发出 finished，否则导出按钮不会恢复
+        summary = {"errors": []}
+        try:
+            summary = export_all_books(progress=self.batcher)
+        except Exception as e:
+            summary["errors"].append(("书库", str(e)))
+        finally:
+            self.batcher.flush()
+            self.finished.emit(summary)
+
+class SearchThread(QThread):
+    result = pyqtSignal(list)
+    error = pyqtSignal(str)
+
+    def __init__(self, keyword, use_cache=True):
+        super().__init__()
+        self.keyword = keyword
+        self.use_cache = use_cache
+
+    def run(self):
+        try:
+            results = search_novel(self.keyword, use_cache=self.use_cache)
+            self.result.emit(results)
+        except Exception as e:
+            self.error.emit(str(e))
+
+class LocalSearchThread(QThread):
+    result = pyqtSignal(list)
+    error = pyqtSignal(str)
+
+    def __init__(self, keyword):
+        super().__init__()
+        self.keyword = keyword
+
+    def run(self):
+        try:
+            self.result.emit(search_library(self.keyword))
+        except Exception as e:
+            self.error.emit(str(e))
+
+class LoadChaptersThread(QThread):
+    result = pyqtSignal(int, int, str)
+    error = pyqtSignal(str)
+
+    def __init__(self, name, url):
+        super().__init__()
+        self.name = name
+        self.url = url
+
+    def run(self):
+        try:
+            downloaded_count, total_chapters = count_chapters(self.name, self.url)
+            self.result.emit(downloaded_count, total_chapters, self.name)
+        except Exception as e:
+            self.error.emit(str(e))
+
+class NovelDownloaderUI(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("小说下载器")
+        self.resize(800, 600)
+        # 列表显示已保存的小说还是搜索结果；选中的条目按 id 记录，不依赖行号
+        self.showing_saved = True
+        self.current_selected_id = None
+        self.current_selected_novel = None
+        self.init_ui()
+        ensure_dirs()
+        self.current_chapter_count = None
+        self.current_downloaded_count = None
+        self.loading_movie = None
+        self.is_downloading = False
+        self.is_updating_all = False
+        self.last_progress_time = None
+        self.last_progress_value = 0
+        self.progress_rate = None
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        search_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("输入小说关键词")
+        self.search_btn = QPushButton("搜索")
+        self.search_btn.clicked.connect(self.on_search)
+        self.local_search_btn = QPushButton("搜索已下载")
+        self.local_search_btn.clicked.connect(self.on_local_search)
+        search_layout.addWidget(self.search_input)
+        search_layout.addWidget(self.search_btn)
+        search_layout.addWidget(self.local_search_btn)
+        layout.addLayout(search_layout)
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("筛选列表")
+        self.filter_input.setClearButtonEnabled(True)
+        self.filter_input.textChanged.connect(self.on_filter_changed)
+        layout.addWidget(self.filter_input)
+        # 模型只向视图提供已取出的行，行高一致时视图不必逐行计算大小
+        self.list_model = NovelListModel(self)
+        self.list_view = QListView()
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setModel(self.list_model)
+        self.list_view.selectionModel().selectionChanged.connect(self.on_novel_selected)
+        layout.addWidget(self.list_view)
+        self.info_text = QTextEdit()
+        self.info_text.setReadOnly(True)
+        self.info_text.document().setMaximumBlockCount(LOG_MAX_LINES)
+        layout.addWidget(self.info_text)
+        btn_layout = QHBoxLayout()
+        self.download_btn = QPushButton("下载/更新")
+        self.download_btn.clicked.connect(self.on_download)
+        self.update_all_btn = QPushButton("全部更新")
+        self.update_all_btn.clicked.connect(self.on_update_all)
+        self.export_btn = QPushButton("导出所有小说")
+        self.export_btn.clicked.connect(self.on_export_all)
+        self.refresh_btn = QPushButton("显示已保存小说")
+        self.refresh_btn.clicked.connect(self.on_refresh_saved)
+        self.delete_btn = QPushButton("删除小说")
+        self.delete_btn.clicked.connect(self.on_delete_novel)
+        self.open_books_btn = QPushButton("打开导出目录")
+        self.open_books_btn.clicked.connect(self.on_open_books_dir)
+        btn_layout.addWidget(self.download_btn)
+        btn_layout.addWidget(self.update_all_btn)
+        btn_layout.addWidget(self.export_btn)
+        btn_layout.addWidget(self.refresh_btn)
+        btn_layout.addWidget(self.delete_btn)
+        btn_layout.addWidget(self.open_books_btn)
+        layout.addLayout(btn_layout)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setValue(0)
+        self.progress_time_label = QLabel("")
+        progress_layout = QHBoxLayout()
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.progress_time_label)
+        layout.addLayout(progress_layout)
+        # 加载动画和底部提示
+        bottom_layout = QHBoxLayout()
+        self.loading_label = QLabel()
+        self.loading_label.setFixedSize(40, 40)
+        self.loading_label.setVisible(False)
+        bottom_layout.addWidget(self.loading_label)
+        self.tips_label = QLabel(
+            "power by intmian@github，放弃除著名权外一切权力，禁止盗版使用，禁止商业使用，禁止结果的任何形式的转载和传播。\n"
+        )
+        self.tips_label.setWordWrap(True)
+        bottom_layout.addWidget(self.tips_label)
+        layout.addLayout(bottom_layout)
+        self.setLayout(layout)
+        self.refresh_saved_list()
+        # 备注直接显示在文字栏
+        self.info_text.setText(
+            "网站高峰期存在访问限制，如果连续下载失败，请稍后再试或者切换网络（VPN）。\n"
+            "搜索可能会出现很多奇怪的结果，是引流内容，请忽略。仅供用户进行爬虫学习使用，禁止进行盗版用途使用。"
+        )
+
+    def append_log(self, msgs):
+        # 一批消息只插入一次并滚动一次
+        self.info_text.append("\n".join(msgs))
+        self.info_text.moveCursor(self.info_text.textCursor().MoveOperation.End)
+
+    def show_loading(self, show=True):
+        if show:
+            if not self.loading_movie:
+                gif_path = os.path.join(os.getcwd(), "loading.gif")
+                if os.path.exists(gif_path):
+                    self.loading_movie = QMovie(gif_path)
+                    self.loading_movie.setScaledSize(self.loading_label.size())  # 缩放gif
+                    self.loading_label.setMovie(self.loading_movie)
+                else:
+                    self.loading_label.setText("加载中...")
+            if self.loading_movie:
+                self.loading_movie.start()
+            self.loading_label.setVisible(True)
+        else:
+            if self.loading_movie:
+                self.loading_movie.stop()
+            self.loading_label.setVisible(False)
+
+    def selected_item(self):
+        indexes = self.list_view.selectionModel().selectedIndexes()
+        return self.list_model.item_at(indexes[0]) if indexes else None
+
+    def select_item(self, item_id):
+        index = self.list_model.index_of(item_id)
+        if index.isValid():
+            self.list_view.setCurrentIndex(index)
+            self.list_view.scrollTo(index)
+
+    def clear_selection(self):
+        self.current_selected_id = None
+        self.current_selected_novel = None
+        self.current_chapter_count = None
+        self.current_downloaded_count = None
+
+    def refresh_saved_list(self):
+        # 书名、作者和章节数都直接查询书库
+        self.list_model.set_items(
+            [{"id": k, "label": f"{k}（{v['author']}）"} for k, v in core.library.novel_list().items()],
+            show_counts=True,
+            counts=core.library.chapter_counts(),
+        )
+        self.showing_saved = True
+        self.info_text.clear()
+        self.clear_selection()
+
+    def on_filter_changed(self, text):
+        # 筛选会重置模型，之后按 id 找回选中的条目
+        selected = self.current_selected_id
+        self.list_model.set_filter(text)
+        if selected is not None:
+            self.select_item(selected)
+
+    def on_refresh_saved(self):
+        self.refresh_saved_list()
+
+    def on_search(self):
+        keyword = self.search_input.text().strip()
+        if not keyword:
+            QMessageBox.warning(self, "提示", "请输入关键词")
+            return
+        # 缓存命中时直接显示结果，不启动搜索线程
+        cached = core.search_cache.get(keyword)
+        if cached is not None:
+            self.on_search_result(cached)
+            return
+        self.list_model.set_items([])
+        self.info_text.setText("正在搜索...")
+        self.search_btn.setEnabled(False)
+        self.search_input.setEnabled(False)
+        self.show_loading(True)
+        QApplication.processEvents()
+        # 启动搜索线程，缓存已在上面查过，线程中不再查一次
+        self.search_thread = SearchThread(keyword, use_cache=False)
+        self.search_thread.result.connect(self.on_search_result)
+        self.search_thread.error.connect(self.on_search_error)
+        self.search_thread.start()
+
+    def on_local_search(self):
+        keyword = self.search_input.text().strip()
+        if not keyword:
+            QMessageBox.warning(self, "提示", "请输入关键词")
+            return
+        self.list_model.set_items([])
+        self.info_text.setText("正在搜索已下载的小说...")
+        self.search_btn.setEnabled(False)
+        self.local_search_btn.setEnabled(False)
+        self.search_input.setEnabled(False)
+        self.show_loading(True)
+        self.local_search_thread = LocalSearchThread(keyword)
+        self.local_search_thread.result.connect(self.on_local_search_result)
+        self.local_search_thread.error.connect(self.on_search_error)
+        self.local_search_thread.start()
+
+    def on_local_search_result(self, results):
+        # 本地结果转换成与站点搜索相同的条目，选中后可以直接更新；章节和摘要显示在简介中
+        novel_list = core.library.novel_list()
+        items = []
+        for hit in results:
+            info = novel_list.get(hit["book"])
+            if info is None:
+                continue
+            desc = f"{hit['chapter']}：{hit['snippet']}" if hit["chapter"] else "书名匹配"
+            # 同一本书可能有多个章节命中，以书名加章节链接区分；列表中显示完整的摘要
+            items.append({
+                "id": f"{hit['book']}\0{hit['link']}", "label": f"《{hit['book']}》{desc}",
+                "name": hit["book"], "author": hit["author"], "url": info["url"], "desc": desc,
+            })
+        self.on_search_result(items, from_site=False)
+        if not items:
+            self.info_text.setText("已下载的小说中没有找到相关内容。")
+
+    def on_search_result(self, results, from_site=True):
+        self.show_loading(False)
+        self.search_btn.setEnabled(True)
+        self.local_search_btn.setEnabled(True)
+        self.search_input.setEnabled(True)
+        items = []
+        for item in results:
+            if "id" not in item:
+                author = item.get("author", "")
+                desc = item.get("desc", "")
+                desc = desc.replace('\n', '').replace('\r', '')
+                desc = desc[:30] + "..." if len(desc) > 30 else desc
+                item = dict(item, id=item["url"], label=f"{item['name']}（{author}） - {desc}")
+            items.append(item)
+        self.list_model.set_items(items)
+        self.showing_saved = False
+        status = "未找到相关小说。" if not results else "请选择小说进行下载。"
+        if from_site:
+            status += "\n" + core.format_search_cache_stats()
+        self.info_text.setText(status)
+        self.clear_selection()
+
+    def on_search_error(self, msg):
+        self.show_loading(False)
+        self.search_btn.setEnabled(True)
+        self.local_search_btn.setEnabled(True)
+        self.search_input.setEnabled(True)
+        self.info_text.setText(f"搜索失败: {msg}")
+
+    def on_novel_selected(self):
+        item = self.selected_item()
+        # 筛选后重新选中同一条目时不重复加载
+        if item is None or item["id"] == self.current_selected_id:
+            return
+        self.current_selected_id = item["id"]
+        if not self.showing_saved:
+            self.current_selected_novel = item
+            info = f"书名: {item['name']}\n作者: {item.get('author','')}\n简介: {item.get('desc','')}\n链接: {item['url']}"
+            self.info_text.setText(info)
+            self.current_chapter_count = None
+            self.current_downloaded_count = None
+        else:
+            name = item["id"]
+            book = core.library.get(name)
+            if book is not None:
+                author = book["author"]
+                url = book["url"]
+                self.current_selected_novel = {"name": name, "author": author, "url": url}
+                # 清空文字栏并显示加载提示
+                self.info_text.clear()
+                self.info_text.setText("正在加载章节...")
+                self.show_loading(True)
+                QApplication.processEvents()
+                # 启动章节加载线程
+                self.load_chapters_thread = LoadChaptersThread(name, url)
+                self.load_chapters_thread.result.connect(self.on_load_chapters_result)
+                self.load_chapters_thread.error.connect(self.on_load_chapters_error)
+                self.load_chapters_thread.start()
+
+    def on_load_chapters_result(self, downloaded_count, total_chapters, name):
+        # 统计结果顺便更新列表中的章节数；加载期间已选中其他小说时不再显示
+        self.list_model.set_counts(name, downloaded_count, total_chapters)
+        if not self.current_selected_novel or self.current_selected_novel["name"] != name:
+            return
+        self.show_loading(False)
+        author = self.current_selected_novel.get("author", "")
+        url = self.current_selected_novel["url"]
+        self.current_chapter_count = total_chapters
+        self.current_downloaded_count = downloaded_count
+        self.info_text.setText(
+            f"书名: {name}\n作者: {author}\n链接: {url}\n"
+            f"已下载章节: {downloaded_count} / {total_chapters}"
+        )
+
+    def on_load_chapters_error(self, msg):
+        self.show_loading(False)
+        self.current_chapter_count = 0
+        self.current_downloaded_count = 0
+        self.info_text.setText(f"加载章节失败: {msg}")
+
+    def on_download(self):
+        if self.is_downloading:
+            # 停止下载
+            if hasattr(self, 'download_thread') and self.download_thread.isRunning():
+                self.download_thread.stop()
+            self.info_text.append("正在停止下载...")
+            self.download_btn.setEnabled(False)
+            return
+        if self.is_updating_all:
+            QMessageBox.warning(self, "提示", "正在批量更新，请稍后再试")
+            return
+        if self.current_selected_novel is None:
+            QMessageBox.warning(self, "提示", "请先选择小说")
+            return
+        name = self.current_selected_novel["name"]
+        url = self.current_selected_novel["url"]
+        author = self.current_selected_novel.get("author", "")
+        # 新增：如果是新小说，弹出输入框确认名称
+        if core.library.get(name) is None:
+            new_name, ok = QInputDialog.getText(self, "确认小说名称", "请输入小说名称：", QLineEdit.EchoMode.Normal, name)
+            if not ok or not new_name.strip():
+                QMessageBox.warning(self, "提示", "小说名称不能为空，已取消下载")
+                return
+            name = new_name.strip()
+            # 更新当前选中小说的name
+            self.current_selected_novel["name"] = name
+            core.library.add(name, url, author)
+        self.progress_bar.setValue(0)
+        self.progress_time_label.setText("")
+        self.download_btn.setText("停止")
+        self.download_btn.setEnabled(True)
+        self.is_downloading = True
+        self.info_text.append("开始下载...")
+        self.show_loading(True)
+        self.last_progress_time = None
+        self.last_progress_value = 0
+        self.progress_rate = None
+        self.download_thread = DownloadThread(name, url, author)
+        self.download_thread.progress.connect(self.on_download_progress)
+        self.download_thread.finished.connect(self.on_download_finished)
+        self.download_thread.start()
+
+    def on_download_progress(self, current, total, msgs):
+        if total > 0:
+            percent = int(current / total * 100)
+            self.progress_bar.setValue(percent)
+            # 预估剩余时间：按批次测得的下载速度做指数平滑
+            now = time.monotonic()
+            if self.last_progress_time is None or current < self.last_progress_value:
+                self.progress_rate = None
+                self.last_progress_time, self.last_progress_value = now, current
+            elif current > self.last_progress_value and now > self.last_progress_time:
+                rate = (current - self.last_progress_value) / (now - self.last_progress_time)
+                if self.progress_rate is None:
+                    self.progress_rate = rate
+                else:
+                    self.progress_rate = ETA_SMOOTHING * rate + (1 - ETA_SMOOTHING) * self.progress_rate
+                self.last_progress_time, self.last_progress_value = now, current
+            time_str = ""
+            if self.progress_rate:
+                remain = (total - current) / self.progress_rate
+                if remain > 0:
+                    mins, secs = divmod(int(remain), 60)
+                    time_str = f"剩余约 {mins}分{secs}秒"
+            self.progress_time_label.setText(time_str)
+        else:
+            self.progress_bar.setValue(0)
+            self.progress_time_label.setText("")
+        self.append_log(msgs)
+
+    def on_download_finished(self, output_file, books_output_file, success, fail, unDownload, report):
+        self.download_btn.setEnabled(True)
+        self.download_btn.setText("下载/更新")
+        self.is_downloading = False
+        self.show_loading(False)
+        self.progress_time_label.setText("")
+        self.list_model.update_counts(core.library.chapter_counts())
+        msg = f"下载完成！\n输出文件: {output_file}\n已导出到: {books_output_file}\n成功: {success}，失败: {fail}，未下载: {unDownload}"
+        msg = "\n".join(report["notes"] + [msg, format_download_report(report, fail)])
+        self.info_text.append(msg)
+        self.progress_bar.setValue(100)
+        # self.refresh_saved_list()
+        QMessageBox.information(self, "下载完成", msg)
+
+    def on_update_all(self):
+        if self.is_updating_all:
+            if hasattr(self, 'update_all_thread') and self.update_all_thread.isRunning():
+                self.update_all_thread.stop()
+            self.info_text.append("正在停止批量更新...")
+            self.update_all_btn.setEnabled(False)
+            return
+        if self.is_downloading:
+            QMessageBox.warning(self, "提示", "正在下载，请等待下载完成")
+            return
+        novel_list = core.library.novel_list()
+        if not novel_list:
+            QMessageBox.warning(self, "提示", "没有已保存的小说")
+            return
+        self.is_updating_all = True
+        self.update_all_btn.setText("停止更新")
+        self.download_btn.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.progress_time_label.setText("")
+        self.info_text.clear()
+        self.info_text.append(f"开始检查 {len(novel_list)} 本小说...")
+        self.show_loading(True)
+        self.update_all_thread = UpdateAllThread(novel_list)
+        self.update_all_thread.progress.connect(self.on_update_all_progress)
+        self.update_all_thread.finished.connect(self.on_update_all_finished)
+        self.update_all_thread.start()
+
+    def on_update_all_progress(self, current, total, msgs):
+        if total > 0:
+            self.progress_bar.setValue(int(current / total * 100))
+        self.append_log(msgs)
+
+    def on_update_all_finished(self, summary):
+        self.is_updating_all = False
+        self.update_all_btn.setText("全部更新")
+        self.update_all_btn.setEnabled(True)
+        self.download_btn.setEnabled(True)
+        self.show_loading(False)
+        self.progress_bar.setValue(100)
+        self.list_model.update_counts(core.library.chapter_counts())
+        msg = format_update_summary(summary)
+        self.info_text.append(msg)
+        QMessageBox.information(self, "批量更新完成", msg)
+
+    def on_export_all(self):
+        # 导出在后台线程中进行，界面不会卡住；导出时会补齐成品文件，下载中不能同时进行
+        if self.is_downloading or self.is_updating_all:
+            QMessageBox.warning(self, "提示", "正在下载，请等待下载完成")
+            return
+        self.export_btn.setEnabled(False)
+        self.info_text.append("正在导出所有小说到 books 文件夹...")
+        self.export_thread = ExportThread()
+        self.export_thread.progress.connect(self.on_export_progress)
+        self.export_thread.finished.connect(self.on_export_finished)
+        self.export_thread.start()
+
+    def on_export_progress(self, current, total, msgs):
+        if not self.is_downloading and not self.is_updating_all and total > 0:
+            self.progress_bar.setValue(int(current / total * 100))
+        self.append_log(msgs)
+
+    def on_export_finished(self, summary):
+        self.export_btn.setEnabled(True)
+        msg = format_export_summary(summary)
+        self.info_text.append(msg)
+        QMessageBox.information(self, "导出完成", msg)
+
+    def on_delete_novel(self):
+        if not self.showing_saved:
+            QMessageBox.warning(self, "提示", "只能删除已保存的小说")
+            return
+        item = self.selected_item()
+        if item is not None and core.library.get(item["id"]) is not None:
+            name = item["id"]
+            reply = QMessageBox.question(self, "确认删除", f"确定要删除小说《{name}》及其所有数据吗？", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+            if reply == QMessageBox.StandardButton.Yes:
+                # 删除数据文件夹、各格式的导出文件、全文索引和书库中的记录
+                delete_book(name)
+                self.refresh_saved_list()
+                QMessageBox.information(self, "删除成功", f"小说《{name}》已删除。")
+        else:
+            QMessageBox.warning(self, "提示", "请选择要删除的小说")
+
+    def on_open_books_dir(self):
+        path = os.path.abspath(core.BOOKS_DIR)
+        if not os.path.exists(path):
+            os.makedirs(path, exist_ok=True)
+        QDesktopServices.openUrl(QUrl.fromLocalFile(path))
+
+def run_gui():
+    app = QApplication(sys.argv)
+    win = NovelDownloaderUI()
+    win.show()
+    sys.exit(app.exec())
@@ -0,0 +1,250 @@
+import email.utils
+import importlib.util
+import random
+import threading
+import time
+
+
+def accept_encoding():
+    # urllib3 只有在安装了 brotli 时才能解码 br
+    if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi"):
+        return "gzip, deflate, br"
+    return "gzip, deflate"
+
+
+class RateLimiter:
+    # 令牌桶限速，所有请求共享同一个实例，保证整体不超过站点限制
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = rate
+
+    def acquire(self):
+        # 返回因限速等待的秒数
+        waited = 0.0
+        while True:
+            with self._lock:
+                if not self.rate or self.rate <= 0:
+                    return waited
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class FetchError(Exception):
+    # 非 200 响应，retry_after 为站点要求的等待秒数（没有时为 None）。
+    # 404、403、410 等 4xx 为永久性错误，重试也不会成功；408、429 和 5xx 为临时错误
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"Failed to fetch the page: {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def permanent(self):
+        return 400 <= self.status_code < 500 and self.status_code not in (408, 429)
+
+
+def parse_retry_after(value):
+    # Retry-After 可以是秒数，也可以是 HTTP 日期
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def backoff_delay(attempt, base, cap):
+    # 指数退避加全抖动，避免失败的请求在同一时刻一起重试
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    # 连续失败达到阈值或站点返回 Retry-After 时断开：暂停发出新请求，冷却后只放行一个探测请求，
+    # 探测成功恢复正常，失败则加倍冷却时间；持续断开超过 give_up 秒时 given_up() 返回 True。
+    # 所有书共用一个实例，站点限流时同时暂停
+    def __init__(self, threshold=3, cooldown=5.0, max_cooldown=60.0, give_up=600.0):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.give_up = give_up
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._cooldown = cooldown
+        self._open_until = 0.0
+        self._open_since = None
+        self._probe_started = None
+
+    def allow(self):
+        # 返回 True 表示可以发出一个请求
+        with self._lock:
+            if self._open_since is None:
+                return True
+            now = time.monotonic()
+            if now < self._open_until:
+                return False
+            # 半开状态：同一时间只放行一个探测请求，探测结果迟迟未返回时再放行一个
+            if self._probe_started is not None and now - self._probe_started < self._cooldown:
+                return False
+            self._probe_started = now
+            return True
+
+    def wait_time(self):
+        with self._lock:
+            if self._open_since is None:
+                return 0.0
+            return max(0.0, self._open_until - time.monotonic())
+
+    def is_open(self):
+        with self._lock:
+            return self._open_since is not None
+
+    def given_up(self, since=0.0):
+        # since 为调用方开始下载的时间，断开时长从两者中较晚的时刻算起
+        with self._lock:
+            if self._open_since is None:
+                return False
+            return time.monotonic() - max(self._open_since, since) > self.give_up
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._cooldown = self.base_cooldown
+            self._open_since = None
+            self._probe_started = None
+
+    def record_failure(self, retry_after=None):
+        # 本次失败导致断开（或探测失败重新断开）时返回暂停的秒数，否则返回 0
+        with self._lock:
+            self._failures += 1
+            now = time.monotonic()
+            if self._open_since is not None:
+                if self._probe_started is None:
+                    # 断开前已发出的请求陆续失败，不重复计入冷却
+                    self._open_until = max(self._open_until, now + (retry_after or 0.0))
+                    return 0.0
+                # 探测失败，加倍冷却
+                self._cooldown = min(self.max_cooldown, self._cooldown * 2)
+                pause = max(self._cooldown, retry_after or 0.0)
+            elif retry_after is None and self._failures < self.threshold:
+                return 0.0
+            else:
+                self._open_since = now
+                pause = self._cooldown if retry_after is None else retry_after
+            self._open_until = now + pause
+            self._probe_started = None
+            return pause
+
+
+def wire_size(response):
+    # 响应正文实际传输的字节数，启用压缩时为压缩后的大小；取不到时退回解压后的长度
+    try:
+        return response.raw.tell()
+    except (AttributeError, OSError):
+        return len(response.content)
+
+
+class HttpClient:
+    # 所有请求共用一个带连接池的 Session，保持长连接，避免每章重新握手
+    def __init__(self, pool_size=16, connect_timeout=5, read_timeout=10, limiter=None):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.limiter = limiter
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._bytes = 0
+        self._session = None
+
+    def _new_session(self):
+        # requests 在第一次发请求时才导入，不联网的命令不必承担导入开销
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        session.headers["Accept-Encoding"] = accept_encoding()
+        session.headers["Connection"] = "keep-alive"
+        # pool_block 让并发超过连接池大小时排队等待，而不是新建用完即弃的连接
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, pool_block=True)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def configure(self, pool_size=None, connect_timeout=None, read_timeout=None):
+        if connect_timeout is not None:
+            self.timeout = (connect_timeout, self.timeout[1])
+        if read_timeout is not None:
+            self.timeout = (self.timeout[0], read_timeout)
+        if pool_size is not None and pool_size != self.pool_size:
+            self.pool_size = pool_size
+            with self._lock:
+                old, self._session = self._session, None
+            if old is not None:
+                old.close()
+            with self._lock:
+                self._requests = 0
+                self._bytes = 0
+
+    def request(self, method, url, **kwargs):
+        waited = self.limiter.acquire() if self.limiter else 0.0
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        response = self._get_session().request(method, url, **kwargs)
+        # 分别记录限速等待时间和从发出请求到读完响应的网络耗时，后者不含限速等待
+        response.throttle_wait = waited
+        response.fetch_time = time.perf_counter() - start
+        response.wire_bytes = wire_size(response)
+        with self._lock:
+            self._requests += 1
+            self._bytes += response.wire_bytes
+        return response
+
+    def _get_session(self):
+        with self._lock:
+            if self._session is None:
+                self._session = self._new_session()
+            return self._session
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        # 新建连接数取自 urllib3 连接池计数，其余请求均复用了已有连接
+        connections = 0
+        session = self._session
+        for adapter in set(session.adapters.values()) if session is not None else ():
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    connections += pool.num_connections
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "connections": connections,
+                "reused": max(0, self._requests - connections),
+                "bytes": self._bytes,
+            }
+
+    def close(self):
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
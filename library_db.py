@@ -0,0 +1,118 @@
+import json
+import os
+import sqlite3
+import threading
+
+# 书库：已保存的小说及其统计信息，每本书一行，保存在一个 SQLite 文件中。
+# 添加、删除和更新统计都只改一行并在一个事务中完成，不再整体重写 novel_list.json；
+# 书库视图直接查询这里的章节数和时间，不必逐本打开章节库。
+# 第一次打开时自动导入旧的 novel_list.json，导入后原文件改名为 novel_list.json.bak
+
+STAT_FIELDS = ("total_chapters", "downloaded_chapters", "last_checked", "last_updated", "store_size", "output_size")
+
+
+class LibraryDB:
+    def __init__(self, path, legacy_file=None):
+        self.path = path
+        self.legacy_file = legacy_file
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_tables()
+            self._migrate()
+        return self._conn
+
+    def _create_tables(self):
+        conn = self._conn
+        # 统计列为空表示还没有统计过（例如刚从 novel_list.json 导入）
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS books ("
+            " book_id INTEGER PRIMARY KEY, title TEXT UNIQUE NOT NULL, author TEXT NOT NULL DEFAULT '',"
+            " url TEXT NOT NULL, total_chapters INTEGER, downloaded_chapters INTEGER,"
+            " last_checked REAL, last_updated REAL, store_size INTEGER, output_size INTEGER)"
+        )
+        # 按待下载章节数建立表达式索引，查询有新章节的书不必扫描全表
+        conn.execute("CREATE INDEX IF NOT EXISTS books_pending ON books(total_chapters - downloaded_chapters)")
+        conn.commit()
+
+    def _migrate(self):
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return
+        with open(self.legacy_file, "r", encoding="utf-8") as f:
+            novel_list = json.load(f)
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO books (title, author, url) VALUES (?, ?, ?) ON CONFLICT(title) DO NOTHING",
+                [(title, info.get("author") or "", info["url"]) for title, info in novel_list.items()],
+            )
+        os.replace(self.legacy_file, self.legacy_file + ".bak")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._connect().execute(sql, params)]
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                return conn.execute(sql, params).rowcount
+
+    def books(self, pending_only=False):
+        # 按加入顺序返回各书的全部字段；pending_only 时只返回目录中还有未下载章节的书
+        if not pending_only:
+            return self._query("SELECT * FROM books ORDER BY book_id")
+        # 带 ORDER BY 时查询计划会放弃表达式索引改为全表扫描，结果不多，取出后再排序
+        rows = self._query("SELECT * FROM books WHERE total_chapters - downloaded_chapters > 0")
+        return sorted(rows, key=lambda row: row["book_id"])
+
+    def get(self, title):
+        rows = self._query("SELECT * FROM books WHERE title = ?", (title,))
+        return rows[0] if rows else None
+
+    def novel_list(self):
+        # 与原 novel_list.json 相同的 {书名: {"url", "author"}}，供批量更新、清理等按书遍历
+        return {
+            row["title"]: {"url": row["url"], "author": row["author"]}
+            for row in self._query("SELECT title, url, author FROM books ORDER BY book_id")
+        }
+
+    def chapter_counts(self):
+        # 已统计过的书的 {书名: (已下载章节数, 目录章节数)}
+        return {
+            row["title"]: (row["downloaded_chapters"], row["total_chapters"])
+            for row in self._query(
+                "SELECT title, downloaded_chapters, total_chapters FROM books WHERE total_chapters IS NOT NULL"
+            )
+        }
+
+    def add(self, title, url, author=""):
+        self._execute(
+            "INSERT INTO books (title, author, url) VALUES (?, ?, ?) "
+            "ON CONFLICT(title) DO UPDATE SET url = excluded.url, author = excluded.author",
+            (title, author or "", url),
+        )
+
+    def remove(self, title):
+        return self._execute("DELETE FROM books WHERE title = ?", (title,)) > 0
+
+    def update_stats(self, title, **stats):
+        # 只更新给出的统计列；不在书库中的书（例如基准测试）不受影响
+        unknown = set(stats) - set(STAT_FIELDS)
+        if unknown:
+            raise ValueError(f"未知的统计字段: {', '.join(sorted(unknown))}")
+        if stats:
+            columns = ", ".join(f"{name} = ?" for name in stats)
+            self._execute(f"UPDATE books SET {columns} WHERE title = ?", (*stats.values(), title))
@@ -0,0 +1,291 @@
+import os
+import re
+import sqlite3
+import threading
+from operator import add
+
+from chapter_store import STORE_FILE_NAME, ChapterStore
+from search_cache import normalize_keyword
+
+# 本地全文索引：所有已下载书籍的章节标题和正文共用一个 SQLite FTS5 索引。
+# 中日韩文字没有空格分词，写入前把连续的汉字切成重叠的二元组（“张三丰” -> “张三 三丰 丰”），
+# 查询时把关键词切成同样的二元组作为短语匹配，单字查询用前缀匹配；拉丁字母和数字按词索引。
+# 索引只保存词项不保存原文（contentless），摘要从书籍的章节库中读取；
+# 另建单字前缀索引，单字查询不必合并所有以该字开头的二元组
+
+CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+TOKEN_RE = re.compile(f"[{CJK}]+|[^\\W_{CJK}]+")
+CJK_RE = re.compile(f"[{CJK}]")
+WHITESPACE_RE = re.compile(r"\s+")
+SNIPPET_CHARS = 30
+INDEX_BATCH = 200
+
+
+def tokenize(text):
+    tokens = []
+    for run in TOKEN_RE.findall(text.lower()):
+        if CJK_RE.match(run):
+            tokens.extend(map(add, run, run[1:]))
+            # 汉字串的最后一个字单独作为词项，单字查询的前缀匹配才能覆盖每一个位置
+            tokens.append(run[-1])
+        else:
+            tokens.append(run)
+    return " ".join(tokens)
+
+
+def build_query(keyword):
+    # 空格分隔的多个词同时满足；返回 (FTS5 查询, 用于定位摘要的词列表)，关键词中没有可检索的字符时返回 None
+    terms = normalize_keyword(keyword).split()
+    phrases = []
+    for term in terms:
+        for run in TOKEN_RE.findall(term):
+            if len(run) == 1 and CJK_RE.match(run):
+                phrases.append(f'"{run}"*')
+            elif CJK_RE.match(run):
+                phrases.append('"' + " ".join(map(add, run, run[1:])) + '"')
+            else:
+                phrases.append(f'"{run}"')
+    if not phrases:
+        return None
+    return " AND ".join(phrases), terms
+
+
+def make_snippet(text, terms):
+    lowered = text.lower()
+    pos = -1
+    for term in terms:
+        pos = lowered.find(term)
+        if pos >= 0:
+            break
+    if pos < 0:
+        return WHITESPACE_RE.sub(" ", text[:SNIPPET_CHARS * 2]).strip()
+    start = max(0, pos - SNIPPET_CHARS)
+    end = pos + len(term) + SNIPPET_CHARS
+    snippet = WHITESPACE_RE.sub(" ", text[start:end]).strip()
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
+
+
+class LibraryIndex:
+    # docs 记录每个已索引章节 (书, 链接, 摘要)，与 FTS 表以 rowid 对应。
+    # SQLite 3.43 之前无法从 contentless 表中直接删除，被替换的章节只删除 docs 中的记录，
+    # 查询时通过 JOIN 过滤，失效的词项超过一半时整体重建
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_tables()
+        return self._conn
+
+    def _create_tables(self):
+        conn = self._conn
+        # 失效章节的词项仍留在 FTS 表中，rowid 一旦被新章节重复使用就会继承这些词项，
+        # 因此 docs 使用 AUTOINCREMENT，rowid 只增不减。旧版索引没有这一保证，整体重建
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'docs'").fetchone()
+        if row and "AUTOINCREMENT" not in row[0].upper():
+            conn.execute("DROP TABLE docs")
+            conn.execute("DROP TABLE IF EXISTS chapter_fts")
+            conn.execute("DROP TABLE IF EXISTS books")
+            conn.execute("DROP TABLE IF EXISTS meta")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS books ("
+            " book_id INTEGER PRIMARY KEY, title TEXT UNIQUE NOT NULL, author TEXT, store_mtime REAL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            " rowid INTEGER PRIMARY KEY AUTOINCREMENT, book_id INTEGER NOT NULL, link TEXT NOT NULL,"
+            " digest TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS docs_book ON docs(book_id, link)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chapter_fts USING fts5("
+            "title, body, content='', prefix='1', tokenize='unicode61 remove_diacritics 0')"
+        )
+        conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _book_id(self, title, author):
+        conn = self._conn
+        row = conn.execute("SELECT book_id FROM books WHERE title = ?", (title,)).fetchone()
+        if row:
+            conn.execute("UPDATE books SET author = ? WHERE book_id = ?", (author, row[0]))
+            return row[0]
+        return conn.execute("INSERT INTO books (title, author) VALUES (?, ?)", (title, author)).lastrowid
+
+    def _add_dead(self, count):
+        if count:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('dead', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value",
+                (count,),
+            )
+
+    def sync_book(self, title, author, store):
+        # 与章节库的输出清单比较摘要，只索引新增或内容变化的章节，返回新索引的章节数
+        manifest = store.output_manifest()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                book_id = self._book_id(title, author or "")
+                indexed = {
+                    link: (rowid, digest)
+                    for rowid, link, digest in conn.execute(
+                        "SELECT rowid, link, digest FROM docs WHERE book_id = ?", (book_id,)
+                    )
+                }
+                current = dict(manifest)
+                stale = [rowid for link, (rowid, digest) in indexed.items() if current.get(link) != digest]
+                conn.executemany("DELETE FROM docs WHERE rowid = ?", [(rowid,) for rowid in stale])
+                self._add_dead(len(stale))
+        changed = [link for link, digest in manifest if indexed.get(link, (None, None))[1] != digest]
+        # 连接由所有线程共用，每批写入都在锁内的一个事务中完成，别的线程不会提交或回滚写了一半的批次；
+        # 分词在锁外进行，批次之间放开锁，下载中的定期索引不会长时间挡住本地搜索
+        for i in range(0, len(changed), INDEX_BATCH):
+            rows = [
+                (link, current[link], tokenize(chapter_title or ""), tokenize(text or ""))
+                for link, chapter_title, text in store.iter_texts(changed[i:i + INDEX_BATCH])
+            ]
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    if not self._insert_batch(book_id, rows):
+                        break
+        return len(changed)
+
+    def _insert_batch(self, book_id, rows):
+        # 在锁内调用。批次之间其他线程可能删除了这本书或已索引了同一章：书不在索引中时返回 False，
+        # 已按相同摘要索引的章节跳过，其余旧记录作废
+        conn = self._conn
+        if not conn.execute("SELECT 1 FROM books WHERE book_id = ?", (book_id,)).fetchone():
+            return False
+        for link, digest, title_tokens, body_tokens in rows:
+            old = conn.execute(
+                "SELECT rowid, digest FROM docs WHERE book_id = ? AND link = ?", (book_id, link)
+            ).fetchall()
+            if any(old_digest == digest for _, old_digest in old):
+                continue
+            conn.executemany("DELETE FROM docs WHERE rowid = ?", [(rowid,) for rowid, _ in old])
+            self._add_dead(len(old))
+            rowid = conn.execute(
+                "INSERT INTO docs (book_id, link, digest) VALUES (?, ?, ?)", (book_id, link, digest)
+            ).lastrowid
+            conn.execute(
+                "INSERT INTO chapter_fts (rowid, title, body) VALUES (?, ?, ?)", (rowid, title_tokens, body_tokens)
+            )
+        return True
+
+    def sync_library(self, novel_list, book_data_dir, progress=None):
+        # 补齐章节库有变化的书（按文件修改时间判断），删除已不在列表中的书；返回新索引的章节数
+        with self._lock:
+            conn = self._connect()
+            known = dict(conn.execute("SELECT title, store_mtime FROM books").fetchall())
+        for title in set(known) - set(novel_list):
+            self.remove_book(title)
+        if self.dead_ratio() > 0.5:
+            self.clear()
+            known = {}
+        indexed = 0
+        for title, info in novel_list.items():
+            path = os.path.join(book_data_dir, title, STORE_FILE_NAME)
+            if not os.path.exists(path) or known.get(title) == store_mtime(path):
+                continue
+            with ChapterStore(path) as store:
+                count = self.sync_book(title, info.get("author", ""), store)
+            # 关闭章节库时会合并 WAL，关闭之后的修改时间才是下次比较的基准
+            with self._lock, self._conn:
+                self._conn.execute("UPDATE books SET store_mtime = ? WHERE title = ?", (store_mtime(path), title))
+            indexed += count
+            if count and progress:
+                progress(f"已索引《{title}》{count} 章")
+        return indexed
+
+    def remove_book(self, title):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                row = conn.execute("SELECT book_id FROM books WHERE title = ?", (title,)).fetchone()
+                if not row:
+                    return
+                removed = conn.execute("DELETE FROM docs WHERE book_id = ?", (row[0],)).rowcount
+                conn.execute("DELETE FROM books WHERE book_id = ?", (row[0],))
+                self._add_dead(removed)
+
+    def dead_ratio(self):
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value FROM meta WHERE key = 'dead'").fetchone()
+            dead = int(row[0]) if row else 0
+            live = conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+        return dead / (dead + live) if dead else 0.0
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM docs")
+                conn.execute("DELETE FROM books")
+                conn.execute("DELETE FROM meta")
+                conn.execute("INSERT INTO chapter_fts (chapter_fts) VALUES ('delete-all')")
+            conn.execute("VACUUM")
+
+    def search(self, keyword, book_data_dir, limit=50):
+        # 返回书名匹配的书（chapter 为空）和正文或章节标题匹配的章节。
+        # 章节按索引顺序（书、目录顺序）返回：按相关度排序需要先为全部匹配项打分，常用字会慢上百倍
+        query = build_query(keyword)
+        if query is None:
+            return []
+        match, terms = query
+        like = "%" + normalize_keyword(keyword).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        with self._lock:
+            conn = self._connect()
+            books = conn.execute(
+                "SELECT title, author FROM books WHERE lower(title) LIKE ? ESCAPE '\\' ORDER BY title LIMIT ?",
+                (like, limit),
+            ).fetchall()
+            hits = conn.execute(
+                "SELECT b.title, b.author, d.link FROM chapter_fts f "
+                "JOIN docs d ON d.rowid = f.rowid JOIN books b ON b.book_id = d.book_id "
+                "WHERE chapter_fts MATCH ? ORDER BY f.rowid LIMIT ?",
+                (match, limit),
+            ).fetchall()
+        results = [
+            {"book": title, "author": author, "chapter": "", "link": "", "snippet": ""} for title, author in books
+        ]
+        stores = {}
+        try:
+            for title, author, link in hits:
+                store = stores.get(title)
+                if store is None:
+                    store = stores[title] = ChapterStore(os.path.join(book_data_dir, title, STORE_FILE_NAME))
+                row = next(iter(store.iter_texts([link])), None)
+                if row is None:
+                    continue
+                _, chapter_title, text = row
+                results.append({
+                    "book": title,
+                    "author": author,
+                    "chapter": chapter_title,
+                    "link": link,
+                    "snippet": make_snippet(text or "", terms),
+                })
+        finally:
+            for store in stores.values():
+                store.close()
+        return results
+
+
+def store_mtime(path):
+    # 章节库与其 WAL 文件中较新的修改时间
+    return max((os.path.getmtime(p) for p in (path, path + "-wal") if os.path.exists(p)), default=0.0)
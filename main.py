@@ -1,616 +1,292 @@
-from bs4 import BeautifulSoup
-from dataclasses import dataclass
-from typing import List
-import os
+import argparse
 import json
-import re
-from tqdm import tqdm
-import requests
-import shutil
+import multiprocessing
 import sys
-from PyQt6.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
-    QLineEdit, QListWidget, QTextEdit, QMessageBox, QFileDialog, QProgressBar, QInputDialog
-)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QUrl
-from PyQt6.QtGui import QDesktopServices, QMovie
-
-baseUrl = "https://m.lwxsw8.com"
-NOVEL_LIST_FILE = os.path.join(os.getcwd(), "novel_list.json")
-BOOK_DATA_DIR = os.path.join(os.getcwd(), "book_data")
-BOOKS_DIR = os.path.join(os.getcwd(), "books")
-
-@dataclass
-class Chapter:
-    title: str
-    link: str
-    text: str
-    content_get: str = None
-
-def ensure_dirs():
-    os.makedirs(BOOK_DATA_DIR, exist_ok=True)
-    os.makedirs(BOOKS_DIR, exist_ok=True)
-
-def extract_chapters(html_content: str) -> List[Chapter]:
-    soup = BeautifulSoup(html_content, 'html.parser')
-    chapters = []
-
-    for a_tag in soup.select('div.book_last dd a'):
-        href = a_tag.get('href')
-        title = a_tag.get_text(strip=True)
-        if title == "↓↓↓ 直达页面底部":
-            continue
-        if href and title != "":
-            chapter = Chapter(title=title, link=href, text="")
-            chapters.append(chapter)
-    
-    return chapters
-
-def get_html(url: str) -> str:
-    response = requests.get(url, timeout=10)
-    if response.status_code == 200:
-        return response.text
-    else:
-        raise Exception(f"Failed to fetch the page: {response.status_code}")
-
-def extract_chapter_text(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
-    content_div = soup.find('div', {'id': 'chaptercontent'})
-    if not content_div:
-        return ""
-    for script in content_div.find_all('script'):
-        script.decompose()
-    lines = []
-    for elem in content_div.contents:
-        if elem.name == 'br':
-            lines.append('\n')
-        elif hasattr(elem, 'get_text'):
-            lines.append(elem.get_text(strip=True))
-        elif isinstance(elem, str):
-            lines.append(elem.strip())
-    text = ''.join(lines)
-    text = text.replace('\xa0', ' ')
-    text = re.sub(r'记住手机版网址：.*', '', text)
-    return text.strip()
-
-def save_state(state_file, state):
-    with open(state_file, "w", encoding="utf-8") as f:
-        json.dump(state, f, ensure_ascii=False, indent=4)
-
-def merge_chapters(chapters, output_file):
-    with open(output_file, "w", encoding="utf-8") as f:
-        for chapter in chapters:
-            if chapter.text.strip():
-                f.write(chapter.text + "\n\n------------\n\n")
-            else:
-                print(f"章节 {chapter.title} 没有内容，跳过。")
-
-def load_novel_list():
-    if os.path.exists(NOVEL_LIST_FILE):
-        with open(NOVEL_LIST_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
-
-def save_novel_list(novel_list):
-    with open(NOVEL_LIST_FILE, "w", encoding="utf-8") as f:
-        json.dump(novel_list, f, ensure_ascii=False, indent=4)
-
-def search_novel(keyword):
-    url = baseUrl + "/search/"
-    data = {
-        "searchkey": keyword,
-        "searchtype": "all",
-        "t_btnsearch": ""
-    }
-    resp = requests.post(url, data=data, timeout=10)
-    resp.encoding = "utf-8"
-    soup = BeautifulSoup(resp.text, "html.parser")
-    results = []
-    for table in soup.find_all("table", class_="list-item"):
-        a_title = table.find("div", class_="article").find("a", href=True)
-        if not a_title:
+import threading
+import time
+
+import core
+
+# 命令行入口。不带参数时启动图形界面，PyQt6 只在启动界面时才导入：
+#   python main.py                      启动图形界面
+#   python main.py search 关键词 [--stats]   --stats 显示搜索缓存的命中情况
+#   python main.py find 关键词             在已下载的书中搜索
+#   python main.py download 书名 [--url 目录页地址] [--author 作者] [--format epub] [--volume-chapters 500]
+#   python main.py update-all
+#   python main.py export
+#   python main.py compress [--mode zstd]
+#   python main.py clean [--reset-boilerplate]   按当前清理规则重新清理已下载的章节，可清空学到的广告行
+#   python main.py repair [书名] [--recent 20] [--all] [--list]   重新下载疑似不完整的章节
+#   python main.py list [--pending]       列出书库中的小说及章节数、最近更新时间
+#   python main.py delete 书名
+
+
+def run_interruptible(target, stop):
+    # 在后台线程中执行，Ctrl+C 时先停止下载，等已完成的章节写入后再返回
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(value=target()), daemon=True)
+    worker.start()
+    try:
+        while worker.is_alive():
+            worker.join(0.5)
+    except KeyboardInterrupt:
+        print("正在停止...")
+        stop()
+        worker.join()
+    return result.get("value")
+
+
+def print_progress(current, total, msg):
+    print(msg)
+
+
+def format_time(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp)) if timestamp else "未知"
+
+
+def add_output_arguments(parser):
+    parser.add_argument("--format", action="append", choices=["txt", "epub"], help="成品格式，可重复指定，默认 txt")
+    parser.add_argument("--volume-chapters", type=int, help="每卷最多章节数，0 为不分卷")
+    parser.add_argument("--volume-mb", type=float, help="每卷最大正文大小（MB），0 为不分卷")
+
+
+def apply_output_arguments(args):
+    if args.format:
+        core.OUTPUT_FORMATS = tuple(dict.fromkeys(args.format))
+    if args.volume_chapters is not None:
+        core.VOLUME_CHAPTERS = args.volume_chapters
+    if args.volume_mb is not None:
+        core.VOLUME_MB = args.volume_mb
+
+
+def cmd_search(args):
+    results = core.search_novel(args.keyword, use_cache=not args.no_cache)
+    if args.stats:
+        # 输出到 stderr，--json 时标准输出仍只有 JSON
+        print(core.format_search_cache_stats(), file=sys.stderr)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return 0
+    if not results:
+        print("未找到相关小说。")
+    for item in results:
+        print(f"{item['name']}（{item['author']}） {item['url']}")
+    return 0
+
+
+def cmd_find(args):
+    if args.rebuild:
+        core.library_index.clear()
+    results = core.search_library(args.keyword, limit=args.limit, progress=print)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return 0
+    if not results:
+        print("已下载的书中没有找到相关内容。")
+    for item in results:
+        if item["chapter"]:
+            print(f"《{item['book']}》{item['chapter']}：{item['snippet']}")
+        else:
+            print(f"《{item['book']}》（{item['author']}）")
+    return 0
+
+
+def cmd_download(args):
+    core.ensure_dirs()
+    apply_output_arguments(args)
+    if args.metrics_file:
+        core.METRICS_PROM_FILE = args.metrics_file
+    info = core.library.get(args.title)
+    url = args.url or (info and info["url"])
+    if not url:
+        print(f"小说《{args.title}》不在已保存列表中，请使用 --url 指定目录页地址")
+        return 1
+    author = args.author if args.author is not None else (info["author"] if info else "")
+    if info is None:
+        core.library.add(args.title, url, author)
+    downloader = core.BookDownloader(args.title, url, author, args.concurrency, progress=print_progress)
+    result = run_interruptible(downloader.run, downloader.stop)
+    if result is None:
+        return 1
+    output_file, books_output_file, success, fail, unDownload, report = result
+    for note in report["notes"]:
+        print(note)
+    print(f"下载完成！\n输出文件: {output_file}\n已导出到: {books_output_file}\n成功: {success}，失败: {fail}，未下载: {unDownload}")
+    print(core.format_download_report(report, fail))
+    return 0
+
+
+def cmd_update_all(args):
+    core.ensure_dirs()
+    apply_output_arguments(args)
+    if args.metrics_file:
+        core.METRICS_PROM_FILE = args.metrics_file
+    updater = core.LibraryUpdater(core.library.novel_list(), parallel=args.parallel, progress=print_progress)
+    summary = run_interruptible(updater.run, updater.stop)
+    if summary is None:
+        return 1
+    print(core.format_update_summary(summary))
+    return 0
+
+
+def cmd_export(args):
+    core.ensure_dirs()
+    apply_output_arguments(args)
+    summary = core.export_all_books(progress=print_progress)
+    print(core.format_export_summary(summary))
+    return 0
+
+
+def cmd_compress(args):
+    mode = None if args.mode == "none" else args.mode
+    before, after = core.compress_library(core.library.novel_list(), mode, progress=print_progress)
+    print(f"完成：{before / 1048576:.1f} MB -> {after / 1048576:.1f} MB")
+    return 0
+
+
+def cmd_clean(args):
+    core.ensure_dirs()
+    summary = core.clean_library(
+        core.library.novel_list(), progress=print_progress, reset_boilerplate=args.reset_boilerplate
+    )
+    print(f"完成：{summary['books']} 本书共清理 {summary['chapters']} 章，新识别广告行 {summary['lines']} 条")
+    return 0
+
+
+def cmd_repair(args):
+    core.ensure_dirs()
+    novel_list = core.library.novel_list()
+    if args.title and args.title not in novel_list:
+        print(f"小说《{args.title}》不在已保存列表中")
+        return 1
+    titles = [args.title] if args.title else list(novel_list)
+    interrupted = threading.Event()
+    for title in titles:
+        info = novel_list[title]
+        targets = core.repair_targets(title, info, recent=args.recent, verify_all=args.all)
+        if targets is None:
+            print(f"《{title}》尚未下载，跳过")
             continue
-        name = a_title.get_text(strip=True)
-        link = a_title["href"]
-        if not link.endswith("/"):
+        suspects, links = targets
+        for _, chapter_title, size, fetched_at, reason in suspects:
+            print(f"《{title}》{chapter_title}：{reason}，{size or 0} 字节，下载于 {format_time(fetched_at)}")
+        if args.list or not links:
+            print(f"《{title}》疑似不完整 {len(suspects)} 章")
             continue
-        author = ""
-        p = table.find("p", class_="fs12 gray")
-        if p:
-            author = p.get_text(strip=True)
-            author = re.sub(r"阅读:\d+", "", author).strip()
-            author = re.sub(r"作者:", "", author).strip()
-        desc_a = table.find_all("a", href=True)
-        desc = ""
-        if len(desc_a) > 1:
-            desc = desc_a[-1].get_text(strip=True)
-        results.append({
-            "name": name,
-            "url": baseUrl + link + "all.html",
-            "author": author,
-            "desc": desc
-        })
-    return results
-
-def export_all_books(novel_list):
-    print("正在导出所有小说到 books 文件夹...")
-    for title, info in novel_list.items():
-        author = info.get("author", "")
-        base_folder = os.path.join(BOOK_DATA_DIR, title)
-        output_folder = os.path.join(base_folder, "output")
-        src_file = os.path.join(output_folder, f"{title}.txt")
-        if os.path.exists(src_file):
-            author_str = f"({author})" if author else ""
-            dst_file = os.path.join(BOOKS_DIR, f"{title}{author_str}.txt")
-            shutil.copyfile(src_file, dst_file)
-            print(f"已导出: {dst_file}")
-        else:
-            print(f"未找到小说 {title} 的成品文件，跳过。")
-    print("全部导出完成。\n")
-
-class DownloadThread(QThread):
-    progress = pyqtSignal(int, int, str)
-    finished = pyqtSignal(str, str, int, int, int, list)
-    
-    def __init__(self, title, url, author):
-        super().__init__()
-        self.title = title
-        self.url = url
-        self.author = author
-        self._stopped = False
-
-    def stop(self):
-        self._stopped = True
-
-    def run(self):
-        title, novel_url, author = self.title, self.url, self.author
-        base_folder = os.path.join(BOOK_DATA_DIR, title)
-        output_folder = os.path.join(base_folder, "output")
-        chapter_folder = os.path.join(base_folder, "chapter")
-        state_file = os.path.join(base_folder, "state.json")
-        os.makedirs(output_folder, exist_ok=True)
-        os.makedirs(chapter_folder, exist_ok=True)
-        if os.path.exists(state_file):
-            with open(state_file, "r", encoding="utf-8") as f:
-                state = json.load(f)
-        else:
-            state = {"downloaded": []}
-        html_content = get_html(novel_url)
-        chapters = extract_chapters(html_content)
-        downloaded_set = set(state["downloaded"])
-        for chapter in chapters:
-            safe_name = chapter.link.lstrip('/').replace('/', '_') + ".txt"
-            chapter_path = os.path.join(chapter_folder, safe_name)
-            if os.path.exists(chapter_path):
-                downloaded_set.add(chapter.link)
-                with open(chapter_path, "r", encoding="utf-8") as cf:
-                    chapter.text = cf.read()
-            else:
-                chapter_path_old = os.path.join(chapter_folder, chapter.title + ".txt")
-                if os.path.exists(chapter_path_old):
-                    downloaded_set.add(chapter.link)
-                    with open(chapter_path_old, "r", encoding="utf-8") as cf:
-                        chapter.text = cf.read()
-            if chapter.text == "":
-                downloaded_set.discard(chapter.link)
-        state["downloaded"] = list(downloaded_set)
-        to_download = [chapter for chapter in chapters if chapter.link not in state["downloaded"]]
-        success, fail, consecutive_fail = 0, 0, 0
-        progress_msgs = []
-        for idx, chapter in enumerate(to_download):
-            if self._stopped:
-                progress_msgs.append("用户已手动停止下载。")
-                break
-            try:
-                chapter_html = get_html(baseUrl + chapter.link)
-                chapter.text = extract_chapter_text(chapter_html)
-                if chapter.text.strip():
-                    safe_name = chapter.link.lstrip('/').replace('/', '_') + ".txt"
-                    chapter_path = os.path.join(chapter_folder, safe_name)
-                    with open(chapter_path, "w", encoding="utf-8") as cf:
-                        cf.write(chapter.text)
-                    state["downloaded"].append(chapter.link)
-                    success += 1
-                    consecutive_fail = 0
-                    msg = f"[{chapter.title}] ({idx+1}/{len(to_download)}) 已下载"
-                else:
-                    fail += 1
-                    consecutive_fail += 1
-                    msg = f"[{chapter.title}] ({idx+1}/{len(to_download)}) 下载失败"
-            except Exception as e:
-                fail += 1
-                consecutive_fail += 1
-                msg = f"[{chapter.title}] ({idx+1}/{len(to_download)}) 下载异常: {e}"
-            progress_msgs.append(msg)
-            self.progress.emit(idx + 1, len(to_download), msg)
-            if consecutive_fail >= 2:
-                break
-        unDownload = 0
-        for chapter in chapters:
-            if chapter.text == "" and chapter.link not in state["downloaded"]:
-                unDownload += 1
-        downloaded_set = set(state["downloaded"])
-        state["downloaded"] = list(downloaded_set)
-        save_state(state_file, state)
-        output_file = os.path.join(output_folder, f"{title}.txt")
-        merge_chapters(chapters, output_file)
-        author_str = f"({author})" if author else ""
-        books_output_file = os.path.join(BOOKS_DIR, f"{title}{author_str}.txt")
-        shutil.copyfile(output_file, books_output_file)
-        self.finished.emit(output_file, books_output_file, success, fail, unDownload, progress_msgs)
-
-class SearchThread(QThread):
-    result = pyqtSignal(list)
-    error = pyqtSignal(str)
-
-    def __init__(self, keyword):
-        super().__init__()
-        self.keyword = keyword
-
-    def run(self):
-        try:
-            results = search_novel(self.keyword)
-            self.result.emit(results)
-        except Exception as e:
-            self.error.emit(str(e))
-
-class LoadChaptersThread(QThread):
-    result = pyqtSignal(int, int, str)
-    error = pyqtSignal(str)
-
-    def __init__(self, name, url):
-        super().__init__()
-        self.name = name
-        self.url = url
-
-    def run(self):
-        try:
-            base_folder = os.path.join(BOOK_DATA_DIR, self.name)
-            chapter_folder = os.path.join(base_folder, "chapter")
-            state_file = os.path.join(base_folder, "state.json")
-            html_content = get_html(self.url)
-            chapters = extract_chapters(html_content)
-            total_chapters = len(chapters)
-            downloaded_set = set()
-            if os.path.exists(state_file):
-                with open(state_file, "r", encoding="utf-8") as f:
-                    state = json.load(f)
-                    downloaded_set = set(state.get("downloaded", []))
-            else:
-                if os.path.exists(chapter_folder):
-                    downloaded_set = set([
-                        fname[:-4] for fname in os.listdir(chapter_folder) if fname.endswith(".txt")
-                    ])
-            downloaded_count = len(downloaded_set)
-            self.result.emit(downloaded_count, total_chapters, "")
-        except Exception as e:
-            self.error.emit(str(e))
-
-class NovelDownloaderUI(QWidget):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("小说下载器")
-        self.resize(800, 600)
-        self.novel_list = load_novel_list()
-        self.init_ui()
-        ensure_dirs()
-        self.current_search_results = []
-        self.current_selected_novel = None
-        self.current_chapter_count = None
-        self.current_downloaded_count = None
-        self.loading_movie = None
-        self.is_downloading = False
-        self.download_start_time = None
-        self.last_progress_value = 0
-
-    def init_ui(self):
-        layout = QVBoxLayout()
-        search_layout = QHBoxLayout()
-        self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("输入小说关键词")
-        self.search_btn = QPushButton("搜索")
-        self.search_btn.clicked.connect(self.on_search)
-        search_layout.addWidget(self.search_input)
-        search_layout.addWidget(self.search_btn)
-        layout.addLayout(search_layout)
-        self.list_widget = QListWidget()
-        self.list_widget.itemSelectionChanged.connect(self.on_novel_selected)
-        layout.addWidget(self.list_widget)
-        self.info_text = QTextEdit()
-        self.info_text.setReadOnly(True)
-        layout.addWidget(self.info_text)
-        btn_layout = QHBoxLayout()
-        self.download_btn = QPushButton("下载/更新")
-        self.download_btn.clicked.connect(self.on_download)
-        self.export_btn = QPushButton("导出所有小说")
-        self.export_btn.clicked.connect(self.on_export_all)
-        self.refresh_btn = QPushButton("显示已保存小说")
-        self.refresh_btn.clicked.connect(self.on_refresh_saved)
-        self.delete_btn = QPushButton("删除小说")
-        self.delete_btn.clicked.connect(self.on_delete_novel)
-        self.open_books_btn = QPushButton("打开导出目录")
-        self.open_books_btn.clicked.connect(self.on_open_books_dir)
-        btn_layout.addWidget(self.download_btn)
-        btn_layout.addWidget(self.export_btn)
-        btn_layout.addWidget(self.refresh_btn)
-        btn_layout.addWidget(self.delete_btn)
-        btn_layout.addWidget(self.open_books_btn)
-        layout.addLayout(btn_layout)
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setValue(0)
-        self.progress_time_label = QLabel("")
-        progress_layout = QHBoxLayout()
-        progress_layout.addWidget(self.progress_bar)
-        progress_layout.addWidget(self.progress_time_label)
-        layout.addLayout(progress_layout)
-        # 加载动画和底部提示
-        bottom_layout = QHBoxLayout()
-        self.loading_label = QLabel()
-        self.loading_label.setFixedSize(40, 40)
-        self.loading_label.setVisible(False)
-        bottom_layout.addWidget(self.loading_label)
-        self.tips_label = QLabel(
-            "power by intmian@github，放弃除著名权外一切权力，禁止盗版使用，禁止商业使用，禁止结果的任何形式的转载和传播。\n"
+        downloader = core.BookDownloader(
+            title, info["url"], info.get("author", ""), args.concurrency, progress=print_progress, refetch=links,
         )
-        self.tips_label.setWordWrap(True)
-        bottom_layout.addWidget(self.tips_label)
-        layout.addLayout(bottom_layout)
-        self.setLayout(layout)
-        self.refresh_saved_list()
-        # 备注直接显示在文字栏
-        self.info_text.setText(
-            "网站高峰期存在访问限制，如果连续下载失败，请稍后再试或者切换网络（VPN）。\n"
-            "搜索可能会出现很多奇怪的结果，是引流内容，请忽略。仅供用户进行爬虫学习使用，禁止进行盗版用途使用。"
-        )
-
-    def show_loading(self, show=True):
-        if show:
-            if not self.loading_movie:
-                gif_path = os.path.join(os.getcwd(), "loading.gif")
-                if os.path.exists(gif_path):
-                    self.loading_movie = QMovie(gif_path)
-                    self.loading_movie.setScaledSize(self.loading_label.size())  # 缩放gif
-                    self.loading_label.setMovie(self.loading_movie)
-                else:
-                    self.loading_label.setText("加载中...")
-            if self.loading_movie:
-                self.loading_movie.start()
-            self.loading_label.setVisible(True)
-        else:
-            if self.loading_movie:
-                self.loading_movie.stop()
-            self.loading_label.setVisible(False)
-
-    def refresh_saved_list(self):
-        self.list_widget.clear()
-        self.novel_list = load_novel_list()
-        for k, v in self.novel_list.items():
-            author = v.get("author", "")
-            self.list_widget.addItem(f"{k}（{author}）")
-        self.current_search_results = []
-        self.info_text.clear()
-        self.current_selected_novel = None
-        self.current_chapter_count = None
-        self.current_downloaded_count = None
-
-    def on_refresh_saved(self):
-        self.refresh_saved_list()
-
-    def on_search(self):
-        keyword = self.search_input.text().strip()
-        if not keyword:
-            QMessageBox.warning(self, "提示", "请输入关键词")
-            return
-        self.list_widget.clear()
-        self.info_text.setText("正在搜索...")
-        self.search_btn.setEnabled(False)
-        self.search_input.setEnabled(False)
-        self.show_loading(True)
-        QApplication.processEvents()
-        # 启动搜索线程
-        self.search_thread = SearchThread(keyword)
-        self.search_thread.result.connect(self.on_search_result)
-        self.search_thread.error.connect(self.on_search_error)
-        self.search_thread.start()
-
-    def on_search_result(self, results):
-        self.show_loading(False)
-        self.search_btn.setEnabled(True)
-        self.search_input.setEnabled(True)
-        self.current_search_results = results
-        self.list_widget.clear()
-        for item in results:
-            author = item.get("author", "")
-            desc = item.get("desc", "")
-            desc = desc.replace('\n', '').replace('\r', '')
-            desc = desc[:30] + "..." if len(desc) > 30 else desc
-            self.list_widget.addItem(f"{item['name']}（{author}） - {desc}")
-        if not results:
-            self.info_text.setText("未找到相关小说。")
-        else:
-            self.info_text.setText("请选择小说进行下载。")
-        self.current_selected_novel = None
-        self.current_chapter_count = None
-        self.current_downloaded_count = None
-
-    def on_search_error(self, msg):
-        self.show_loading(False)
-        self.search_btn.setEnabled(True)
-        self.search_input.setEnabled(True)
-        self.info_text.setText(f"搜索失败: {msg}")
-
-    def on_novel_selected(self):
-        idx = self.list_widget.currentRow()
-        if self.current_search_results:
-            if 0 <= idx < len(self.current_search_results):
-                item = self.current_search_results[idx]
-                self.current_selected_novel = item
-                info = f"书名: {item['name']}\n作者: {item.get('author','')}\n简介: {item.get('desc','')}\n链接: {item['url']}"
-                self.info_text.setText(info)
-                self.current_chapter_count = None
-                self.current_downloaded_count = None
-        else:
-            keys = list(self.novel_list.keys())
-            if 0 <= idx < len(keys):
-                name = keys[idx]
-                author = self.novel_list[name].get("author", "")
-                url = self.novel_list[name]["url"]
-                self.current_selected_novel = {"name": name, "author": author, "url": url}
-                # 清空文字栏并显示加载提示
-                self.info_text.clear()
-                self.info_text.setText("正在加载章节...")
-                self.show_loading(True)
-                QApplication.processEvents()
-                # 启动章节加载线程
-                self.load_chapters_thread = LoadChaptersThread(name, url)
-                self.load_chapters_thread.result.connect(self.on_load_chapters_result)
-                self.load_chapters_thread.error.connect(self.on_load_chapters_error)
-                self.load_chapters_thread.start()
-
-    def on_load_chapters_result(self, downloaded_count, total_chapters, _):
-        self.show_loading(False)
-        name = self.current_selected_novel["name"]
-        author = self.current_selected_novel.get("author", "")
-        url = self.current_selected_novel["url"]
-        self.current_chapter_count = total_chapters
-        self.current_downloaded_count = downloaded_count
-        self.info_text.setText(
-            f"书名: {name}\n作者: {author}\n链接: {url}\n"
-            f"已下载章节: {downloaded_count} / {total_chapters}"
-        )
-
-    def on_load_chapters_error(self, msg):
-        self.show_loading(False)
-        self.current_chapter_count = 0
-        self.current_downloaded_count = 0
-        self.info_text.setText(f"加载章节失败: {msg}")
-
-    def on_download(self):
-        if self.is_downloading:
-            # 停止下载
-            if hasattr(self, 'download_thread') and self.download_thread.isRunning():
-                self.download_thread.stop()
-            self.info_text.append("正在停止下载...")
-            self.download_btn.setEnabled(False)
-            return
-        if self.current_selected_novel is None:
-            QMessageBox.warning(self, "提示", "请先选择小说")
-            return
-        name = self.current_selected_novel["name"]
-        url = self.current_selected_novel["url"]
-        author = self.current_selected_novel.get("author", "")
-        # 新增：如果是新小说，弹出输入框确认名称
-        if name not in self.novel_list:
-            new_name, ok = QInputDialog.getText(self, "确认小说名称", "请输入小说名称：", QLineEdit.EchoMode.Normal, name)
-            if not ok or not new_name.strip():
-                QMessageBox.warning(self, "提示", "小说名称不能为空，已取消下载")
-                return
-            name = new_name.strip()
-            # 更新当前选中小说的name
-            self.current_selected_novel["name"] = name
-            self.novel_list[name] = {"url": url, "author": author}
-            save_novel_list(self.novel_list)
-        self.progress_bar.setValue(0)
-        self.progress_time_label.setText("")
-        self.download_btn.setText("停止")
-        self.download_btn.setEnabled(True)
-        self.is_downloading = True
-        self.info_text.append("开始下载...")
-        self.show_loading(True)
-        self.download_start_time = None
-        self.last_progress_value = 0
-        self.download_thread = DownloadThread(name, url, author)
-        self.download_thread.progress.connect(self.on_download_progress)
-        self.download_thread.finished.connect(self.on_download_finished)
-        self.download_thread.start()
-
-    def on_download_progress(self, current, total, msg):
-        if total > 0:
-            percent = int(current / total * 100)
-            self.progress_bar.setValue(percent)
-            # 预估剩余时间
-            import time
-            now = time.time()
-            if self.download_start_time is None or current < self.last_progress_value:
-                self.download_start_time = now
-                self.last_progress_value = current
-            elapsed = now - self.download_start_time if self.download_start_time else 0
-            if current > 0 and elapsed > 0:
-                speed = elapsed / current
-                remain = (total - current) * speed
-                if remain > 0:
-                    mins, secs = divmod(int(remain), 60)
-                    time_str = f"剩余约 {mins}分{secs}秒"
-                else:
-                    time_str = ""
-            else:
-                time_str = ""
-            self.progress_time_label.setText(time_str)
-            self.last_progress_value = current
-        else:
-            self.progress_bar.setValue(0)
-            self.progress_time_label.setText("")
-        self.info_text.append(msg)
-        self.info_text.moveCursor(self.info_text.textCursor().MoveOperation.End)
-
-    def on_download_finished(self, output_file, books_output_file, success, fail, unDownload, progress_msgs):
-        self.download_btn.setEnabled(True)
-        self.download_btn.setText("下载/更新")
-        self.is_downloading = False
-        self.show_loading(False)
-        self.progress_time_label.setText("")
-        msg = f"下载完成！\n输出文件: {output_file}\n已导出到: {books_output_file}\n成功: {success}，失败: {fail}，未下载: {unDownload}"
-        self.info_text.append(msg)
-        self.progress_bar.setValue(100)
-        # self.refresh_saved_list()
-        QMessageBox.information(self, "下载完成", msg)
-
-    def on_export_all(self):
-        self.export_btn.setEnabled(False)
-        export_all_books(self.novel_list)
-        self.export_btn.setEnabled(True)
-        QMessageBox.information(self, "导出完成", "全部小说已导出到 books 文件夹。")
-
-    def on_delete_novel(self):
-        idx = self.list_widget.currentRow()
-        if self.current_search_results:
-            QMessageBox.warning(self, "提示", "只能删除已保存的小说")
-            return
-        keys = list(self.novel_list.keys())
-        if 0 <= idx < len(keys):
-            name = keys[idx]
-            reply = QMessageBox.question(self, "确认删除", f"确定要删除小说《{name}》及其所有数据吗？", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
-            if reply == QMessageBox.StandardButton.Yes:
-                # 删除数据文件夹
-                base_folder = os.path.join(BOOK_DATA_DIR, name)
-                if os.path.exists(base_folder):
-                    shutil.rmtree(base_folder, ignore_errors=True)
-                # 删除导出文件
-                author = self.novel_list[name].get("author", "")
-                author_str = f"({author})" if author else ""
-                books_output_file = os.path.join(BOOKS_DIR, f"{name}{author_str}.txt")
-                if os.path.exists(books_output_file):
-                    os.remove(books_output_file)
-                # 删除映射
-                del self.novel_list[name]
-                save_novel_list(self.novel_list)
-                self.refresh_saved_list()
-                QMessageBox.information(self, "删除成功", f"小说《{name}》已删除。")
-        else:
-            QMessageBox.warning(self, "提示", "请选择要删除的小说")
-
-    def on_open_books_dir(self):
-        path = os.path.abspath(BOOKS_DIR)
-        if not os.path.exists(path):
-            os.makedirs(path, exist_ok=True)
-        QDesktopServices.openUrl(QUrl.fromLocalFile(path))
-
-def main():
-    app = QApplication(sys.argv)
-    win = NovelDownloaderUI()
-    win.show()
-    sys.exit(app.exec())
+        result = run_interruptible(downloader.run, lambda: (interrupted.set(), downloader.stop()))
+        if result is None:
+            return 1
+        _, _, _, fail, _, report = result
+        for note in report["notes"]:
+            print(note)
+        print(f"《{title}》修复完成：内容有变化 {report['changed']} 章，未变化 {report['unchanged']} 章，失败 {fail}")
+        if interrupted.is_set():
+            break
+    return 0
+
+
+def cmd_list(args):
+    # 章节数和时间直接取自书库，不打开各书的章节库
+    for book in core.library.books(pending_only=args.pending):
+        line = f"{book['title']}（{book['author']}） {book['url']}"
+        if book["total_chapters"] is not None:
+            line += (
+                f"  已下载 {book['downloaded_chapters']}/{book['total_chapters']}，"
+                f"最近更新 {format_time(book['last_updated'])}，最近检查 {format_time(book['last_checked'])}"
+            )
+        print(line)
+    return 0
+
+
+def cmd_delete(args):
+    if core.library.get(args.title) is None:
+        print(f"小说《{args.title}》不在已保存列表中")
+        return 1
+    core.delete_book(args.title)
+    print(f"小说《{args.title}》已删除。")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="小说下载器，不带参数时启动图形界面")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="搜索小说")
+    search.add_argument("keyword")
+    search.add_argument("--json", action="store_true", help="以 JSON 输出搜索结果")
+    search.add_argument("--no-cache", action="store_true", help="忽略搜索缓存，重新请求站点")
+    search.add_argument("--stats", action="store_true", help="显示搜索缓存的命中、未命中和淘汰次数")
+    search.set_defaults(func=cmd_search)
+
+    find = commands.add_parser("find", help="在已下载的书中搜索书名、章节标题和正文")
+    find.add_argument("keyword")
+    find.add_argument("--limit", type=int, default=50)
+    find.add_argument("--json", action="store_true", help="以 JSON 输出搜索结果")
+    find.add_argument("--rebuild", action="store_true", help="清空后重新建立索引")
+    find.set_defaults(func=cmd_find)
+
+    download = commands.add_parser("download", help="下载或更新一本小说")
+    download.add_argument("title")
+    download.add_argument("--url", help="目录页地址，新小说必须指定")
+    download.add_argument("--author")
+    download.add_argument("--concurrency", type=int)
+    download.add_argument("--metrics-file", help="下载后写入 Prometheus 文本格式的指标文件")
+    add_output_arguments(download)
+    download.set_defaults(func=cmd_download)
+
+    update_all = commands.add_parser("update-all", help="检查并更新所有已保存的小说")
+    update_all.add_argument("--parallel", type=int, help="同时下载的书籍数量")
+    update_all.add_argument("--metrics-file", help="每本书下载后更新 Prometheus 文本格式的指标文件")
+    add_output_arguments(update_all)
+    update_all.set_defaults(func=cmd_update_all)
+
+    export = commands.add_parser("export", help="导出所有小说到 books 文件夹")
+    add_output_arguments(export)
+    export.set_defaults(func=cmd_export)
+
+    compress = commands.add_parser("compress", help="按指定方式重新压缩所有小说的章节库")
+    compress.add_argument("--mode", choices=["zstd", "zlib", "none"], default="zstd")
+    compress.set_defaults(func=cmd_compress)
+
+    clean = commands.add_parser("clean", help="按当前清理规则重新清理已下载的章节并重新识别广告行")
+    clean.add_argument(
+        "--reset-boilerplate", action="store_true", help="清空各书学到的广告行，成品文件中恢复被误删的行"
+    )
+    clean.set_defaults(func=cmd_clean)
+
+    repair = commands.add_parser("repair", help="重新下载疑似不完整或占位的章节，只替换内容有变化的章节")
+    repair.add_argument("title", nargs="?", help="书名，不指定时检查所有已保存的小说")
+    repair.add_argument("--recent", type=int, default=0, help="同时重新下载目录最后几章")
+    repair.add_argument("--all", action="store_true", help="重新下载全部章节并比较内容")
+    repair.add_argument("--list", action="store_true", help="只列出疑似不完整的章节，不重新下载")
+    repair.add_argument("--concurrency", type=int)
+    repair.set_defaults(func=cmd_repair)
+
+    list_cmd = commands.add_parser("list", help="列出已保存的小说")
+    list_cmd.add_argument("--pending", action="store_true", help="只列出上次检查时还有未下载章节的小说")
+    list_cmd.set_defaults(func=cmd_list)
+
+    delete = commands.add_parser("delete", help="删除小说及其所有数据")
+    delete.add_argument("title")
+    delete.set_defaults(func=cmd_delete)
+
+    commands.add_parser("gui", help="启动图形界面")
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] == "gui":
+        from gui import run_gui
+        return run_gui()
+    args = build_parser().parse_args(argv)
+    return args.func(args)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # 打包后的程序启动解析子进程时需要
+    multiprocessing.freeze_support()
+    sys.exit(main())
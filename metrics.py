@@ -0,0 +1,166 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+# 直方图桶上限（秒），覆盖从解析的亚毫秒级到慢请求的十秒级
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REPORT_FILE_NAME = "metrics.json"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum_s": round(self.sum, 6),
+            "mean_ms": round(self.sum / self.count * 1000, 3) if self.count else 0,
+            "max_ms": round(self.max * 1000, 3),
+            "buckets": self.counts,
+        }
+
+
+class RunMetrics:
+    # 一次下载的各阶段耗时直方图与计数，每次记录只是加锁后做几次加法，可以一直开启
+    def __init__(self, book=""):
+        self.book = book
+        self.started_at = time.time()
+        self.finished_at = None
+        self.phases = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = Histogram()
+            histogram.observe(seconds)
+
+    def add(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def timed(self, phase):
+        return _Timer(self, phase)
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    def to_dict(self):
+        with self._lock:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+            chapters = self.counters.get("chapters", 0)
+            return {
+                "book": self.book,
+                "started_at": round(self.started_at, 3),
+                "elapsed_s": round(elapsed, 4),
+                "chapters_per_s": round(chapters / elapsed, 2) if elapsed > 0 else 0,
+                "counters": dict(self.counters),
+                "buckets": list(BUCKETS),
+                "phases": {name: histogram.to_dict() for name, histogram in self.phases.items()},
+            }
+
+    def save(self, folder):
+        write_atomic(os.path.join(folder, REPORT_FILE_NAME), json.dumps(self.to_dict(), ensure_ascii=False, indent=4))
+
+
+class _Timer:
+    __slots__ = ("metrics", "phase", "start")
+
+    def __init__(self, metrics, phase):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.phase, time.perf_counter() - self.start)
+
+
+def write_atomic(path, content):
+    # 先写临时文件再替换，采集程序不会读到写了一半的文件
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def load_reports(book_data_dir):
+    reports = []
+    if not os.path.isdir(book_data_dir):
+        return reports
+    for title in sorted(os.listdir(book_data_dir)):
+        path = os.path.join(book_data_dir, title, REPORT_FILE_NAME)
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                reports.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return reports
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_prometheus(reports):
+    # Prometheus 文本格式，每本书最近一次下载的数据，以 book 标签区分
+    lines = [
+        "# HELP novel_download_phase_seconds 最近一次下载各阶段的耗时",
+        "# TYPE novel_download_phase_seconds histogram",
+    ]
+    for report in reports:
+        book = _label(report["book"])
+        buckets = report.get("buckets", BUCKETS)
+        for phase, histogram in sorted(report["phases"].items()):
+            labels = f'book="{book}",phase="{_label(phase)}"'
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ["+Inf"], histogram["buckets"]):
+                cumulative += count
+                lines.append(f'novel_download_phase_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"novel_download_phase_seconds_sum{{{labels}}} {_number(histogram['sum_s'])}")
+            lines.append(f"novel_download_phase_seconds_count{{{labels}}} {histogram['count']}")
+    gauges = [
+        ("novel_download_last_run_timestamp_seconds", "最近一次下载的开始时间", lambda r: r["started_at"]),
+        ("novel_download_last_run_duration_seconds", "最近一次下载的总耗时", lambda r: r["elapsed_s"]),
+        ("novel_download_last_run_chapters_per_second", "最近一次下载的章节吞吐量", lambda r: r["chapters_per_s"]),
+    ]
+    for name, help_text, value in gauges:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for report in reports:
+            lines.append(f'{name}{{book="{_label(report["book"])}"}} {_number(value(report))}')
+    counter_names = sorted({name for report in reports for name in report["counters"]})
+    for counter in counter_names:
+        name = f"novel_download_last_run_{counter}"
+        lines.append(f"# TYPE {name} gauge")
+        for report in reports:
+            if counter in report["counters"]:
+                lines.append(f'{name}{{book="{_label(report["book"])}"}} {_number(report["counters"][counter])}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, book_data_dir):
+    write_atomic(path, format_prometheus(load_reports(book_data_dir)))
@@ -0,0 +1,186 @@
+import sqlite3
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, Qt, QThread, QTimer, pyqtSignal
+
+from core import local_chapter_counts
+
+# 列表每次向视图提供的行数，滚动到底部时再取下一批
+FETCH_BATCH = 200
+# 后台线程每次统计多少本书的章节数
+COUNT_BATCH = 50
+
+
+class ChapterCountThread(QThread):
+    # 逐本读取章节库中的已下载 / 目录章节数，不访问网络；没有章节库的书发出 (-1, -1)
+    counted = pyqtSignal(str, int, int)
+
+    def __init__(self, titles):
+        super().__init__()
+        self.titles = titles
+
+    def run(self):
+        for title in self.titles:
+            try:
+                counts = local_chapter_counts(title)
+            except (sqlite3.Error, OSError):
+                counts = None
+            self.counted.emit(title, *(counts or (-1, -1)))
+
+
+class NovelListModel(QAbstractListModel):
+    # 条目为 dict，必须带 "id"（稳定标识，选中、刷新和筛选后都按它定位）和 "label"（显示文字）。
+    # 视图只拿到已取出的行，滚动到底部时再取下一批；筛选只重新生成 id 列表，不复制条目。
+    # show_counts 为真时 id 即书名，章节数优先取书库中记录的统计，没有记录的书在视图绘制到该行时
+    # 才到后台统计，结果按书名缓存
+    IdRole = Qt.ItemDataRole.UserRole
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._items = {}
+        self._order = []
+        self._filter = ""
+        self._filtered = []
+        self._rows = {}
+        self._loaded = 0
+        self.show_counts = False
+        self._counts = {}
+        self._wanted = []
+        self._pending = set()
+        self._count_thread = None
+
+    def set_items(self, items, show_counts=False, counts=None):
+        # counts 为已知的 {书名: (已下载章节数, 目录章节数)}
+        self.beginResetModel()
+        self._items = {item["id"]: item for item in items}
+        self._order = list(self._items)
+        self.show_counts = show_counts
+        self._counts = dict(counts or {})
+        self._apply_filter()
+        self.endResetModel()
+
+    def set_filter(self, text):
+        text = text.strip().casefold()
+        if text == self._filter:
+            return
+        self.beginResetModel()
+        self._filter = text
+        self._apply_filter()
+        self.endResetModel()
+
+    def _apply_filter(self):
+        if self._filter:
+            self._filtered = [i for i in self._order if self._filter in self._items[i]["label"].casefold()]
+        else:
+            self._filtered = list(self._order)
+        self._rows = {item_id: row for row, item_id in enumerate(self._filtered)}
+        self._loaded = min(FETCH_BATCH, len(self._filtered))
+
+    def total_count(self):
+        # 筛选后的条目数（包括尚未取出的行）
+        return len(self._filtered)
+
+    def item(self, item_id):
+        return self._items.get(item_id)
+
+    def item_at(self, index):
+        if not index.isValid() or index.row() >= self._loaded:
+            return None
+        return self._items[self._filtered[index.row()]]
+
+    def index_of(self, item_id):
+        # 条目在筛选结果中的位置，尚未取出时先取到该行；不在结果中时返回无效索引
+        row = self._rows.get(item_id)
+        if row is None:
+            return QModelIndex()
+        if row >= self._loaded:
+            self._fetch_to(row + FETCH_BATCH)
+        return self.index(row)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self._loaded < len(self._filtered)
+
+    def fetchMore(self, parent):
+        if not parent.isValid():
+            self._fetch_to(self._loaded + FETCH_BATCH)
+
+    def _fetch_to(self, end):
+        # 一次插入取到第 end 行为止的所有行
+        end = min(end, len(self._filtered))
+        if end <= self._loaded:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, end - 1)
+        self._loaded = end
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= self._loaded:
+            return None
+        item_id = self._filtered[index.row()]
+        if role == self.IdRole:
+            return item_id
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        label = self._items[item_id]["label"]
+        if not self.show_counts:
+            return label
+        if item_id not in self._counts:
+            self._request_count(item_id)
+            return label
+        counts = self._counts[item_id]
+        return f"{label}  已下载 {counts[0]}/{counts[1]}" if counts else label
+
+    def set_counts(self, title, downloaded, total):
+        self._counts[title] = (downloaded, total) if total >= 0 else None
+        self._row_changed(title)
+
+    def update_counts(self, counts):
+        # 下载或更新后用书库中的新统计刷新已显示的行
+        self._counts.update(counts)
+        if self._loaded:
+            self.dataChanged.emit(self.index(0), self.index(self._loaded - 1), [Qt.ItemDataRole.DisplayRole])
+
+    def _row_changed(self, item_id):
+        row = self._rows.get(item_id)
+        if row is not None and row < self._loaded:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+
+    def _request_count(self, title):
+        if title in self._pending:
+            return
+        self._pending.add(title)
+        self._wanted.append(title)
+        # 同一次绘制中请求的行合并成一批
+        if len(self._wanted) == 1 and self._count_thread is None:
+            QTimer.singleShot(0, self._start_counting)
+
+    def _start_counting(self):
+        if self._count_thread is not None:
+            return
+        # 快速滚动时已经移出列表的书不再统计
+        batch = []
+        while self._wanted and len(batch) < COUNT_BATCH:
+            title = self._wanted.pop(0)
+            if self.show_counts and title in self._rows:
+                batch.append(title)
+            else:
+                self._pending.discard(title)
+        if not batch:
+            return
+        self._count_thread = ChapterCountThread(batch)
+        self._count_thread.counted.connect(self._on_counted)
+        self._count_thread.finished.connect(self._on_count_finished)
+        self._count_thread.start()
+
+    def _on_counted(self, title, downloaded, total):
+        self._pending.discard(title)
+        self.set_counts(title, downloaded, total)
+
+    def _on_count_finished(self):
+        # finished 在线程退出前发出，等它真正结束后再释放
+        self._count_thread.wait()
+        self._count_thread = None
+        self._start_counting()
@@ -1,3 +1,3 @@
 @echo off
-nuitka main.py --standalone --onefile --enable-plugin=pyqt6 --windows-console-mode=disable --remove-output
+nuitka main.py --standalone --onefile --enable-plugin=pyqt6 --include-data-files=clean_rules.txt=clean_rules.txt --windows-console-mode=disable --remove-output
 pause
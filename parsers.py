@@ -0,0 +1,159 @@
+import re
+
+# 可插拔的 HTML 解析后端。所有后端的输出必须与 html.parser 版本逐字节一致，
+# 由 bench/check_parsers.py 使用 bench/golden 下的样本校验。
+
+CHAPTER_DIV_RE = re.compile(r"""<div\b[^>]*\bid\s*=\s*["']?chaptercontent\b""", re.I)
+CATALOG_DIV_RE = re.compile(r"""<div\b[^>]*\bclass\s*=\s*["']?[^"'>]*\bbook_last\b""", re.I)
+# 这些标签内的文字在 BeautifulSoup 中是独立的字符串类型，get_text 默认不包含
+STRING_CONTAINERS = {"script", "style", "template", "rt", "rp"}
+
+
+def targeted_slice(html, pattern):
+    # 只从目标 div 开始解析，跳过页头；目标位于注释或脚本中时退回整页解析
+    match = pattern.search(html)
+    if not match:
+        return html
+    start = match.start()
+    if html.rfind("<!--", 0, start) > html.rfind("-->", 0, start):
+        return html
+    if html.rfind("<script", 0, start) > html.rfind("</script", 0, start):
+        return html
+    return html[start:]
+
+
+class SoupBackend:
+    name = "html.parser"
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self._soup = BeautifulSoup
+
+    def catalog_links(self, html):
+        soup = self._soup(targeted_slice(html, CATALOG_DIV_RE), 'html.parser')
+        return [(a_tag.get('href'), a_tag.get_text(strip=True)) for a_tag in soup.select('div.book_last dd a')]
+
+    def chapter_text(self, html):
+        soup = self._soup(targeted_slice(html, CHAPTER_DIV_RE), 'html.parser')
+        content_div = soup.find('div', {'id': 'chaptercontent'})
+        if not content_div:
+            return None
+        for script in content_div.find_all('script'):
+            script.decompose()
+        lines = []
+        for elem in content_div.contents:
+            if elem.name == 'br':
+                lines.append('\n')
+            elif hasattr(elem, 'get_text'):
+                lines.append(elem.get_text(strip=True))
+            elif isinstance(elem, str):
+                lines.append(elem.strip())
+        return ''.join(lines)
+
+
+def _needs_reference(html):
+    # libxml2 会把 \r\n 归一为 \n，并把 CDATA 当作注释，这类页面交给 html.parser
+    return "\r" in html or "<![CDATA[" in html
+
+
+class LxmlBackend:
+    name = "lxml"
+
+    def __init__(self):
+        from lxml import etree
+        self._etree = etree
+        self._fallback = None
+
+    def _reference(self):
+        if self._fallback is None:
+            self._fallback = SoupBackend()
+        return self._fallback
+
+    def _parse(self, html):
+        # etree.HTML 使用线程独立的默认解析器，可以在下载线程池中并发调用
+        try:
+            return self._etree.HTML(html)
+        except ValueError:
+            # 带编码声明的 str 需要按字节解析
+            return self._etree.HTML(html.encode("utf-8"), self._etree.HTMLParser(encoding="utf-8"))
+
+    @staticmethod
+    def _get_text(el):
+        top = el.tag if el.tag in STRING_CONTAINERS else None
+        parts = []
+
+        def walk(node, container):
+            if node.text and container == top:
+                text = node.text.strip()
+                if text:
+                    parts.append(text)
+            for child in node:
+                if isinstance(child.tag, str):
+                    walk(child, child.tag if child.tag in STRING_CONTAINERS else container)
+                if child.tail and container == top:
+                    text = child.tail.strip()
+                    if text:
+                        parts.append(text)
+
+        walk(el, top)
+        return ''.join(parts)
+
+    def catalog_links(self, html):
+        if _needs_reference(html):
+            return self._reference().catalog_links(html)
+        root = self._parse(targeted_slice(html, CATALOG_DIV_RE))
+        if root is None:
+            return []
+        anchors = root.xpath(
+            '//div[contains(concat(" ", normalize-space(@class), " "), " book_last ")]//dd//a'
+        )
+        return [(a.get('href'), self._get_text(a)) for a in anchors]
+
+    def chapter_text(self, html):
+        if _needs_reference(html):
+            return self._reference().chapter_text(html)
+        root = self._parse(targeted_slice(html, CHAPTER_DIV_RE))
+        if root is None:
+            return None
+        found = root.xpath('//div[@id="chaptercontent"]')
+        if not found:
+            return None
+        content_div = found[0]
+        lines = [content_div.text.strip()] if content_div.text else []
+        for child in content_div:
+            if child.tag == 'br':
+                lines.append('\n')
+            elif isinstance(child.tag, str) and child.tag != 'script':
+                lines.append(self._get_text(child))
+            if child.tail:
+                lines.append(child.tail.strip())
+        return ''.join(lines)
+
+
+BACKENDS = {
+    "lxml": LxmlBackend,
+    "html.parser": SoupBackend,
+}
+
+
+def available_backends():
+    names = []
+    for name, cls in BACKENDS.items():
+        try:
+            cls()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_backend(name=None):
+    # 未指定时按 BACKENDS 的顺序选择已安装的最快后端
+    if name:
+        return BACKENDS[name]()
+    for cls in BACKENDS.values():
+        try:
+            return cls()
+        except ImportError:
+            continue
+    return SoupBackend()
@@ -0,0 +1,97 @@
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_keyword(keyword):
+    # 全角/半角、大小写、多余空白不同的关键词视为同一次搜索
+    keyword = unicodedata.normalize("NFKC", keyword)
+    return re.sub(r"\s+", " ", keyword).strip().lower()
+
+
+class SearchCache:
+    # 关键词 -> 解析后的搜索结果，LRU 淘汰 + 过期时间，可选持久化到 JSON 文件
+    def __init__(self, max_entries=128, ttl=3600, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._loaded = path is None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # 第一次访问时才读取缓存文件，文件损坏时当作空缓存
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for key, (stored_at, results) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if now - stored_at < self.ttl:
+                self._entries[key] = (stored_at, results)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(dict(self._entries), f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get(self, keyword):
+        key = normalize_keyword(keyword)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] >= self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [dict(item) for item in entry[1]]
+
+    def put(self, keyword, results):
+        key = normalize_keyword(keyword)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._entries[key] = (time.time(), [dict(item) for item in results])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            if self.path:
+                try:
+                    self._save()
+                except OSError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._loaded = True
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
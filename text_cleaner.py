@@ -0,0 +1,107 @@
+import os
+import re
+from collections import Counter
+
+# 正文清理：规则文件中的正则表达式在加载时预编译，每章找出所有匹配范围后一次性删除；
+# 另外按出现频率识别同一本书中反复出现的整行广告（学到的行保存在各书的章节库中）
+
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clean_rules.txt")
+# 在多少章中出现、占抽样章节的比例以及最短长度都达到时，一行才被当作重复广告
+BOILERPLATE_SAMPLE = 300
+BOILERPLATE_MIN_CHAPTERS = 5
+BOILERPLATE_RATIO = 0.05
+BOILERPLATE_MIN_LENGTH = 8
+REGEX_META = set("\\.^$*+?{}[]|()")
+
+
+def load_rules(path=None):
+    # 每行一条正则表达式，匹配到的内容被删除；以 "line:" 开头的规则删除匹配所在的整行；# 开头为注释
+    path = path if path and os.path.exists(path) else DEFAULT_RULES_FILE
+    rules = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip("\r\n")
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            kind, pattern = ("line", line[5:].strip()) if line.startswith("line:") else ("sub", line)
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"清理规则第 {number} 行无效: {e}") from None
+            rules.append((kind, pattern))
+    return rules
+
+
+def literal_prefix(pattern):
+    # 规则开头的普通文字；后面紧跟量词时最后一个字可有可无，不算在内。含有 | 的规则可能不以它开头，不做预判
+    if "|" in pattern:
+        return ""
+    prefix = []
+    for char in pattern:
+        if char in REGEX_META:
+            if char in "*?{" and prefix:
+                prefix.pop()
+            break
+        prefix.append(char)
+    return "".join(prefix)
+
+
+def remove_lines(text, boilerplate):
+    return "\n".join(line for line in text.split("\n") if line.strip() not in boilerplate)
+
+
+def learn_boilerplate(texts):
+    # 统计每一行出现在多少章中（同一章内重复只算一次），返回足够频繁的行
+    counts = Counter()
+    chapters = 0
+    for text in texts:
+        chapters += 1
+        counts.update({
+            line for line in (raw.strip() for raw in text.split("\n")) if len(line) >= BOILERPLATE_MIN_LENGTH
+        })
+    threshold = max(BOILERPLATE_MIN_CHAPTERS, chapters * BOILERPLATE_RATIO)
+    return {line for line, count in counts.items() if count >= threshold}
+
+
+class TextCleaner:
+    # 规则逐条预编译。Python 的正则引擎只对单个模式的固定开头做快速查找，合并成一个 | 分支的大模式后
+    # 每个位置都要逐一尝试各分支，反而慢几十倍；因此以普通文字开头的规则先用字符串查找判断本章是否可能匹配，
+    # 各规则找到的范围合并后一次性拼出结果
+    def __init__(self, rules):
+        self.rules = [(kind, re.compile(pattern), literal_prefix(pattern)) for kind, pattern in rules]
+
+    @classmethod
+    def from_file(cls, path=None):
+        return cls(load_rules(path))
+
+    def _remove_matches(self, text):
+        spans = []
+        for kind, pattern, literal in self.rules:
+            if literal and literal not in text:
+                continue
+            for match in pattern.finditer(text):
+                start, end = match.span()
+                if kind == "line":
+                    start = text.rfind("\n", 0, start) + 1
+                    newline = text.find("\n", end)
+                    end = len(text) if newline < 0 else newline + 1
+                spans.append((start, end))
+        if not spans:
+            return text
+        # 扩展后的整行可能覆盖前面的匹配，按起点排序后合并
+        pieces, pos = [], 0
+        for start, end in sorted(spans):
+            if start > pos:
+                pieces.append(text[pos:start])
+            pos = max(pos, end)
+        pieces.append(text[pos:])
+        return "".join(pieces)
+
+    def clean(self, text, boilerplate=None):
+        # 不换行空格统一为普通空格（str.replace 比 str.translate 快得多）
+        text = text.replace("\xa0", " ")
+        if self.rules:
+            text = self._remove_matches(text)
+        if boilerplate:
+            text = remove_lines(text, boilerplate)
+        return text.strip()
@@ -0,0 +1,99 @@
+import zlib
+
+# 压缩后的正文以 BLOB 保存，首字节标明格式；未压缩的正文仍是 TEXT，读取时按类型区分
+ZLIB_PREFIX = b"\x01"
+ZSTD_PREFIX = b"\x02"
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 6
+# 每本书攒够多少章后训练 zstd 字典，以及字典大小
+DICT_SAMPLE_CHAPTERS = 100
+DICT_SIZE = 32 * 1024
+MODES = ("zstd", "zlib")
+
+
+def zstd_module():
+    # zstandard 为可选依赖，没有安装时 zstd 模式退回 zlib
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def resolve_mode(mode):
+    if not mode:
+        return None
+    if mode not in MODES:
+        raise ValueError(f"未知的压缩方式: {mode}")
+    if mode == "zstd" and zstd_module() is None:
+        return "zlib"
+    return mode
+
+
+class TextCodec:
+    # 正文的压缩与解压。dictionaries 为 {dict_id: 字典内容}，zstd 帧头中记录了所用字典的编号
+    def __init__(self, mode=None, dictionaries=None):
+        self.mode = resolve_mode(mode)
+        self._zstd = zstd_module()
+        self._dictionaries = dict(dictionaries or {})
+        self._dict_id = max(self._dictionaries) if self._dictionaries else None
+        self._compressor = None
+        self._decompressors = {}
+
+    @property
+    def has_dictionary(self):
+        return self._dict_id is not None
+
+    def add_dictionary(self, dict_id, data):
+        self._dictionaries[dict_id] = data
+        self._dict_id = dict_id
+        self._compressor = None
+
+    def train(self, texts):
+        # 用本书已下载的章节训练字典，返回 (dict_id, 字典内容)；样本不足时返回 None
+        samples = [text.encode("utf-8") for text in texts if text]
+        if self._zstd is None or len(samples) < 8:
+            return None
+        try:
+            dictionary = self._zstd.train_dictionary(DICT_SIZE, samples)
+        except self._zstd.ZstdError:
+            return None
+        return dictionary.dict_id(), dictionary.as_bytes()
+
+    def encode(self, text):
+        if not text or self.mode is None:
+            return text
+        data = text.encode("utf-8")
+        if self.mode == "zlib":
+            return ZLIB_PREFIX + zlib.compress(data, ZLIB_LEVEL)
+        if self._compressor is None:
+            if self._dict_id is None:
+                self._compressor = self._zstd.ZstdCompressor(level=ZSTD_LEVEL)
+            else:
+                dictionary = self._zstd.ZstdCompressionDict(self._dictionaries[self._dict_id])
+                self._compressor = self._zstd.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary)
+        return ZSTD_PREFIX + self._compressor.compress(data)
+
+    def decode(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        value = bytes(value)
+        prefix, payload = value[:1], value[1:]
+        if prefix == ZLIB_PREFIX:
+            return zlib.decompress(payload).decode("utf-8")
+        if prefix != ZSTD_PREFIX:
+            raise ValueError("无法识别的章节数据格式")
+        if self._zstd is None:
+            raise RuntimeError("章节以 zstd 压缩保存，请先安装 zstandard（pip install zstandard）")
+        dict_id = self._zstd.get_frame_parameters(payload).dict_id
+        decompressor = self._decompressors.get(dict_id)
+        if decompressor is None:
+            if dict_id:
+                if dict_id not in self._dictionaries:
+                    raise ValueError(f"缺少编号为 {dict_id} 的压缩字典")
+                dictionary = self._zstd.ZstdCompressionDict(self._dictionaries[dict_id])
+                decompressor = self._zstd.ZstdDecompressor(dict_data=dictionary)
+            else:
+                decompressor = self._zstd.ZstdDecompressor()
+            self._decompressors[dict_id] = decompressor
+        return decompressor.decompress(payload).decode("utf-8")